@@ -0,0 +1,118 @@
+################################################################################
+# Title:    audio.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Sound playback. A SoundBank decodes each sound file once, through an audio
+# backend, and keeps the decoded sounds in an LRU cache, so switching the timer
+# sound or pressing buttons quickly never reads the disk again. Backends only
+# need load(path), set_volume(sound, volume) and play(sound): NSSoundBackend
+# plays through AppKit, NullBackend plays nothing and records the calls, for
+# headless use (Linux, benchmarks).
+
+import os
+from collections import OrderedDict
+
+BUTTON_SOUND = "sounds/button.mp3"
+
+
+class NSSoundBackend(object):
+    """Plays sounds through AppKit's NSSound"""
+    def load(self, path):
+        from AppKit import NSSound
+        # byReference=False reads and decodes the whole file now, not on the first play
+        return NSSound.alloc().initWithContentsOfFile_byReference_(os.path.abspath(path), False)
+
+    def set_volume(self, sound, volume):
+        sound.setVolume_(volume)
+
+    def play(self, sound):
+        sound.play()
+
+
+class NullBackend(object):
+    """Plays nothing, records what it was asked to do"""
+    def __init__(self):
+        # paths passed to load, (path, volume) of every set_volume and of every play
+        self.loads = []
+        self.volumes = []
+        self.plays = []
+        self._volumes = {}
+
+    def load(self, path):
+        self.loads.append(path)
+        return path
+
+    def set_volume(self, sound, volume):
+        self.volumes.append((sound, volume))
+        self._volumes[sound] = volume
+
+    def play(self, sound):
+        self.plays.append((sound, self._volumes.get(sound)))
+
+
+def default_backend():
+    """Returns the NSSound backend, or the null one where AppKit is not available"""
+    try:
+        import AppKit  # noqa: F401
+    except ImportError:
+        return NullBackend()
+    return NSSoundBackend()
+
+
+class SoundBank(object):
+    """Loads each sound once and keeps the most recently used ones
+
+    Args:
+        backend (optional): the audio backend. Defaults to default_backend().
+        capacity (int, optional): number of decoded sounds kept. Defaults to 8, all of sounds/.
+    """
+    def __init__(self, backend=None, capacity=8):
+        self.backend = backend if backend is not None else default_backend()
+        self.capacity = capacity
+        # path -> [sound, volume it was last set to], least recently used first
+        self._sounds = OrderedDict()
+        # sounds loaded and sounds dropped from the cache
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sounds)
+
+    def _entry(self, path):
+        entry = self._sounds.get(path)
+        if entry is not None:
+            self._sounds.move_to_end(path)
+            return entry
+        entry = self._sounds[path] = [self.backend.load(path), None]
+        self.loads += 1
+        if len(self._sounds) > self.capacity:
+            self._sounds.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def get(self, path):
+        """Returns the decoded sound of a file, loading it if it is not cached"""
+        return self._entry(path)[0]
+
+    def preload(self, paths):
+        """Loads sounds ahead of their first play"""
+        for path in paths:
+            self._entry(path)
+
+    def play(self, path, volume):
+        """Plays a sound file at a volume (0-1), the volume is only set when it changes"""
+        entry = self._entry(path)
+        if entry[1] != volume:
+            self.backend.set_volume(entry[0], volume)
+            entry[1] = volume
+        self.backend.play(entry[0])
@@ -0,0 +1,64 @@
+################################################################################
+# Title:    benchmarks/bench_metrics.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Overhead of the metrics instrumentation per call, disabled and enabled,
+# against an uninstrumented call. @timed is applied with metrics enabled, as
+# disabled it returns the function itself; "@timed, disabled" is the flag check
+# left in a wrapper when metrics are turned off afterwards. Runs headless, from the repository root:
+#
+#   python -m benchmarks.bench_metrics --calls 1000000
+
+import argparse
+import sys
+import timeit
+
+from metrics import Metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overhead of the Tomado metrics instrumentation")
+    parser.add_argument("--calls", type=int, default=1000000, help="calls per measurement (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements, the best is kept (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    metrics = Metrics(enabled=True)
+
+    def plain():
+        pass
+
+    instrumented = metrics.timed("op")(plain)
+
+    def block():
+        with metrics.measure("op"):
+            pass
+
+    def best_ns(func):
+        return min(timeit.repeat(func, number=args.calls, repeat=args.repeat)) / args.calls * 1e9
+
+    baseline = best_ns(plain)
+    rows = [("plain call", baseline)]
+    for enabled in (False, True):
+        metrics.enabled = enabled
+        state = "enabled" if enabled else "disabled"
+        rows.append(("@timed, " + state, best_ns(instrumented)))
+        rows.append(("measure(), " + state, best_ns(block)))
+
+    print("{:<22} {:>10} {:>12}".format("call", "ns", "overhead ns"))
+    for name, ns in rows:
+        print("{:<22} {:>10.1f} {:>12.1f}".format(name, ns, ns - baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
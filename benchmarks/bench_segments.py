@@ -0,0 +1,97 @@
+################################################################################
+# Title:    benchmarks/bench_segments.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Size and query latency of segmented stats with plain, gzip and lzma cold
+# segments. Runs headless, from the repository root:
+#
+#   python -m benchmarks.bench_segments --records 1000000 --days 1825
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.synthetic import write_history
+from records import local_midnight
+from stats_segments import SegmentedStats, migrate_segments
+from utilities import export_records
+
+FORMATS = ("plain", "gzip", "lzma")
+
+
+def _best(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def _folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(folder, entry)) for entry in os.listdir(folder) if entry != "manifest.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Size and latency of compressed cold stats segments")
+    parser.add_argument("--records", type=int, default=200000, help="history size (default: %(default)s)")
+    parser.add_argument("--days", type=int, default=1825, help="days of history (default: %(default)s)")
+    parser.add_argument("--older-than", type=int, default=90, help="archive age in days (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    today = date.today()
+    end = datetime.combine(today, datetime.min.time())
+    # a month of closed history, a year back
+    month_start = (today - timedelta(days=365)).replace(day=1)
+    range_start = local_midnight(month_start)
+    range_end = local_midnight((month_start + timedelta(days=32)).replace(day=1))
+
+    root = tempfile.mkdtemp(prefix="tomado-bench-")
+    try:
+        log_path = os.path.join(root, "stats.jsonl")
+        write_history(log_path, args.records, days=args.days, end=end)
+        print("{:<6} {:>14} {:>9} {:>12} {:>12} {:>12} {:>12}".format(
+            "format", "bytes", "ratio", "all time ms", "week ms", "month ms", "export ms"))
+        plain_bytes = None
+        for fmt in FORMATS:
+            folder = os.path.join(root, fmt)
+            migrate_segments(log_path, folder)
+            if fmt != "plain":
+                SegmentedStats(folder).archive(args.older_than, fmt, today)
+            size = _folder_bytes(folder)
+            plain_bytes = plain_bytes or size
+            store = SegmentedStats(folder)
+
+            def export():
+                with open(os.devnull, "w", newline="") as f:
+                    export_records(store.records(), f, "csv")
+
+            print("{:<6} {:>14,} {:>8.1f}x {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f}".format(
+                fmt, size, plain_bytes / size,
+                _best(lambda: SegmentedStats(folder).all_time(), args.repeat) * 1000,
+                _best(lambda: store.compute_stats(today), args.repeat) * 1000,
+                _best(lambda: sum(1 for _ in store.records(range_start, range_end)), args.repeat) * 1000,
+                _best(export, 1) * 1000,
+            ))
+    finally:
+        shutil.rmtree(root)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+################################################################################
+# Title:    benchmarks/bench_stats.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Benchmarks of the stats hot paths over synthetic histories. Runs headless
+# (no rumps/AppKit), from the repository root:
+#
+#   python -m benchmarks.bench_stats --sizes 1000,100000 --output results.json
+#   python -m benchmarks.bench_stats --compare results.json
+#
+# Every benchmark reports its best and median latency, the throughput in
+# records per second and, unless --no-memory is passed, the peak memory
+# allocated by one run (measured in a separate, traced run).
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from benchmarks.synthetic import generate_history, write_history
+from records import make_record
+from stats_sqlite import SQLiteStats, import_stats
+from utilities import (append_interval, compute_stats, export_records, iter_stats,
+                       load_aggregator, read_stats)
+
+try:
+    import stats_numpy
+except ImportError:
+    stats_numpy = None
+
+# name -> (setup, run); run returns the number of records it processed
+BENCHMARKS = {}
+# appends timed by the append_interval benchmark
+APPENDS = 100
+
+
+def benchmark(name, setup=None):
+    """Registers a benchmark function, called with the context dict of a history size"""
+    def register(run):
+        BENCHMARKS[name] = (setup, run)
+        return run
+    return register
+
+
+def _remove_rollup(ctx):
+    if os.path.exists(ctx["rollup_path"]):
+        os.remove(ctx["rollup_path"])
+
+
+def _ensure_rollup(ctx):
+    load_aggregator(ctx["log_path"], ctx["rollup_path"], date.today())
+
+
+def _ensure_records(ctx):
+    # only the in-memory benchmarks hold the whole history, built once per size
+    if "records" not in ctx:
+        ctx["records"] = list(generate_history(ctx["size"], **ctx["history"]))
+
+
+def _remove_sqlite(ctx):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(ctx["sqlite_path"] + suffix):
+            os.remove(ctx["sqlite_path"] + suffix)
+
+
+def _ensure_sqlite(ctx):
+    if not os.path.exists(ctx["sqlite_path"]):
+        with SQLiteStats(ctx["sqlite_path"]) as store:
+            import_stats(ctx["log_path"], store)
+
+
+@benchmark("read_stats")
+def bench_read_stats(ctx):
+    return len(read_stats(ctx["log_path"]))
+
+
+@benchmark("read_stats_legacy")
+def bench_read_stats_legacy(ctx):
+    return len(read_stats(ctx["legacy_path"]))
+
+
+@benchmark("append_interval")
+def bench_append_interval(ctx):
+    now = datetime.now().isoformat(timespec="seconds")
+    for _ in range(APPENDS):
+        append_interval(ctx["append_path"], "pomodoro", now, 1500, "Project 1")
+    return APPENDS
+
+
+@benchmark("compute_stats", setup=_ensure_records)
+def bench_compute_stats(ctx):
+    compute_stats(ctx["records"], date.today())
+    return len(ctx["records"])
+
+
+@benchmark("append_sqlite", setup=_ensure_sqlite)
+def bench_append_sqlite(ctx):
+    # a start second per append, the store keeps one interval per start, type and project
+    first = int(time.time()) + ctx.setdefault("sqlite_appends", 0)
+    ctx["sqlite_appends"] += APPENDS
+    with SQLiteStats(ctx["sqlite_path"]) as store:
+        for ts in range(first, first + APPENDS):
+            store.add(make_record("pomodoro", ts, 1500, "Project 1"))
+    return APPENDS
+
+
+if stats_numpy is not None and stats_numpy.np is not None:
+    @benchmark("compute_stats_numpy", setup=_ensure_records)
+    def bench_compute_stats_numpy(ctx):
+        stats_numpy.compute_stats(ctx["records"], date.today())
+        return len(ctx["records"])
+
+
+@benchmark("compute_stats_sqlite", setup=_ensure_sqlite)
+def bench_compute_stats_sqlite(ctx):
+    with SQLiteStats(ctx["sqlite_path"]) as store:
+        store.compute_stats(date.today())
+    return ctx["size"]
+
+
+@benchmark("import_sqlite", setup=_remove_sqlite)
+def bench_import_sqlite(ctx):
+    with SQLiteStats(ctx["sqlite_path"]) as store:
+        return import_stats(ctx["log_path"], store)
+
+
+@benchmark("export_stats")
+def bench_export_stats(ctx):
+    with open(os.devnull, "w", newline="") as f:
+        return export_records(iter_stats(ctx["log_path"]), f, "csv")
+
+
+# the work Tomado.__init__ and Tomado.load_stats do to show the stats menu
+@benchmark("load_stats_cold", setup=_remove_rollup)
+def bench_load_stats_cold(ctx):
+    load_aggregator(ctx["log_path"], ctx["rollup_path"], date.today()).results(date.today())
+    return ctx["size"]
+
+
+@benchmark("load_stats_warm", setup=_ensure_rollup)
+def bench_load_stats_warm(ctx):
+    load_aggregator(ctx["log_path"], ctx["rollup_path"], date.today()).results(date.today())
+    return ctx["size"]
+
+
+def run_benchmark(name, ctx, repeat, memory):
+    setup, run = BENCHMARKS[name]
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup(ctx)
+        started = time.perf_counter()
+        ops = run(ctx)
+        timings.append(time.perf_counter() - started)
+    result = {
+        "benchmark": name,
+        "records": ctx["size"],
+        "ops": ops,
+        "best_s": min(timings),
+        "median_s": statistics.median(timings),
+        "throughput_per_s": ops / min(timings) if min(timings) else None,
+        "peak_bytes": None,
+    }
+    if memory:
+        if setup:
+            setup(ctx)
+        tracemalloc.start()
+        run(ctx)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def compare(results, baseline_path, threshold):
+    """Prints the change of the best latency of every benchmark against a previous results file
+
+    Returns:
+        int: number of regressions (slower by more than threshold)
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["benchmark"], r["records"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["benchmark"], result["records"]))
+        if not old or not old["best_s"]:
+            continue
+        ratio = result["best_s"] / old["best_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print("{:<22} {:>10}  {:>6.2f}x{}".format(result["benchmark"], result["records"], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the Tomado stats hot paths")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated history sizes, 1000 to 10000000 (default: %(default)s)")
+    parser.add_argument("--projects", type=int, default=5, help="distinct projects (default: %(default)s)")
+    parser.add_argument("--days", type=int, default=365, help="days of history (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--only", help="comma separated benchmark names (default: all)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run measuring peak memory")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="RESULTS", help="compare against a previous JSON results file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown reported as a regression by --compare (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(sorted(unknown))))
+
+    # a fixed end keeps the histories identical between runs, today keeps today/week non-empty
+    end = datetime.combine(date.today(), datetime.min.time())
+    results = []
+    print("{:<22} {:>10} {:>12} {:>12} {:>14} {:>12}".format(
+        "benchmark", "records", "best ms", "median ms", "records/s", "peak KiB"))
+    for size in (int(s) for s in args.sizes.split(",")):
+        folder = tempfile.mkdtemp(prefix="tomado-bench-")
+        try:
+            ctx = {
+                "size": size,
+                "log_path": os.path.join(folder, "stats.jsonl"),
+                "legacy_path": os.path.join(folder, "stats.json"),
+                "rollup_path": os.path.join(folder, "stats.rollup.json"),
+                "append_path": os.path.join(folder, "append.jsonl"),
+                "sqlite_path": os.path.join(folder, "stats.sqlite3"),
+                "history": dict(projects=args.projects, days=args.days, seed=args.seed, end=end),
+            }
+            # the files are streamed from the generator, see _ensure_records for the in-memory list
+            write_history(ctx["log_path"], size, **ctx["history"])
+            shutil.copyfile(ctx["log_path"], ctx["append_path"])
+            if "read_stats_legacy" in names:
+                write_history(ctx["legacy_path"], size, legacy=True, **ctx["history"])
+            for name in names:
+                result = run_benchmark(name, ctx, args.repeat, not args.no_memory)
+                results.append(result)
+                print("{:<22} {:>10} {:>12.2f} {:>12.2f} {:>14,.0f} {:>12}".format(
+                    name, size, result["best_s"] * 1000, result["median_s"] * 1000,
+                    result["throughput_per_s"] or 0,
+                    "-" if result["peak_bytes"] is None else result["peak_bytes"] // 1024))
+        finally:
+            shutil.rmtree(folder)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now().isoformat(timespec="seconds"),
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "args": vars(args),
+                },
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        print()
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
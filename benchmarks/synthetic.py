@@ -0,0 +1,71 @@
+################################################################################
+# Title:    benchmarks/synthetic.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Deterministic synthetic stats histories for the benchmarks. The same
+# arguments always produce the same records, so results are comparable
+# between versions and machines.
+
+import json
+import random
+from datetime import datetime, timedelta
+
+from records import make_record
+
+
+def generate_history(count, projects=5, days=365, seed=0, end=None):
+    """Yields interval records sorted by start time, spread evenly over a number of days
+
+    Args:
+        count (int): number of records
+        projects (int, optional): number of distinct projects, plus "no project". Defaults to 5.
+        days (int, optional): days of history ending at end. Defaults to 365.
+        seed (int, optional): random seed. Defaults to 0.
+        end (datetime, optional): end of the history. Defaults to now.
+
+    Yields:
+        dict: interval record in the stats log format
+    """
+    rnd = random.Random(seed)
+    names = [""] + ["Project {}".format(i + 1) for i in range(projects)]
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+    for i in range(count):
+        interval_type = "pomodoro" if i % 2 == 0 else ("long" if i % 8 == 7 else "break")
+        length = {"pomodoro": 1500, "break": 300, "long": 900}[interval_type]
+        ts = int((start + timedelta(seconds=int(i * step))).timestamp())
+        yield make_record(interval_type, ts, rnd.randint(length // 2, length), rnd.choice(names))
+
+
+def write_history(path, count, legacy=False, **kwargs):
+    """Writes a synthetic history to a stats file, streaming the records as they are generated
+
+    Args:
+        path (string): path of the file
+        count (int): number of records
+        legacy (bool, optional): write the JSON list of stats.json (records without ts) instead of the stats log.
+            Defaults to False.
+        **kwargs: passed to generate_history
+    """
+    records = generate_history(count, **kwargs)
+    with open(path, "w") as f:
+        if legacy:
+            f.write("[")
+            for i, record in enumerate(records):
+                record = {key: value for key, value in record.items() if key != "ts"}
+                f.write(("," if i else "") + "\n  " + json.dumps(record))
+            f.write("\n]\n")
+            return
+        for record in records:
+            f.write(json.dumps(record) + "\n")
@@ -0,0 +1,279 @@
+################################################################################
+# Title:    cli.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Headless command line for the stats, run as `python -m tomado <command>`
+# (tomado.py hands the subcommands over before importing rumps, so nothing here
+# needs AppKit and it runs on Linux too):
+#
+#   python -m tomado stats --from 2026-01-01 --to 2026-03-31 --by week
+#   python -m tomado export --format jsonl --project Thesis -o thesis.jsonl
+#   python -m tomado import old/stats.json
+#   python -m tomado merge combined.jsonl mac1/stats.jsonl mac2/stats.jsonl
+#
+# Reports of the log come from the per-day rollup index next to it (the one the
+# app loads and saves), so they don't read the history once the index is up to
+# date; the files of earlier versions are read whole. Reports never write the
+# index. Quit the app before import, which rewrites the log.
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+from records import ProjectTable, record_start
+from stats_merge import merge_stats
+from utilities import (EXPORT_FORMATS, StatsAggregator, _empty_period, _merge_period, _project_period,
+                       export_records, iter_any_stats, load_aggregator, stats_format)
+
+# where the app keeps its files on macOS (rumps.application_support)
+DEFAULT_FOLDER = os.path.expanduser("~/Library/Application Support/Tomado")
+COLUMNS = ("pomodoros", "pomodoro_time", "breaks", "break_time")
+# bytes of the log left to read line by line when searching for the first record of a range
+RANGE_BLOCK = 65536
+
+
+def _day(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a YYYY-MM-DD date: {}".format(text))
+
+
+def _paths(args):
+    stats_path = args.file or os.path.join(DEFAULT_FOLDER, "stats.jsonl")
+    folder = os.path.dirname(os.path.abspath(stats_path))
+    base = os.path.splitext(os.path.basename(stats_path))[0]
+    return stats_path, os.path.join(folder, base + ".rollup.json"), os.path.join(folder, "projects.json")
+
+
+def _rows(aggregator, start, end, by, project, projects):
+    """Yields (label, period) of the days from start to end (both inclusive), grouped by day, week or project"""
+    if by == "project":
+        period = aggregator.between(start, end)
+        by_project = projects.resolve(period["by_project"])
+        for name in sorted(by_project):
+            if project is None or name == project:
+                yield name, by_project[name]
+        if project in (None, ""):
+            yield "(no project)", _project_period(period, "")
+        return
+    group, totals = None, _empty_period()
+    for day in aggregator.day_index:
+        if day < start or day > end:
+            continue
+        label = day if by == "day" else day - timedelta(days=day.weekday())
+        if label != group:
+            if group is not None:
+                yield group.isoformat(), totals
+            group, totals = label, _empty_period()
+        period = aggregator.days[day]
+        if project:
+            data = projects.resolve(period["by_project"]).get(project)
+            period = _empty_period() if data is None else dict(data, by_project={})
+        elif project is not None:
+            period = _project_period(period, project)
+        _merge_period(totals, period)
+    if group is not None:
+        yield group.isoformat(), totals
+
+
+def command_stats(args):
+    stats_path, rollup_path, projects_path = _paths(args)
+    if stats_format(stats_path) == "log":
+        aggregator = load_aggregator(stats_path, rollup_path, date.today(), save=False)
+    else:
+        aggregator = StatsAggregator(date.today())
+        aggregator.load(iter_any_stats(stats_path))
+    projects = ProjectTable.load(projects_path)
+    start = args.start or (aggregator.day_index[0] if aggregator.day_index else date.today())
+    end = args.end or date.today()
+    # project names as shown in the app, a renamed project is counted under its recorded names too
+    project = args.project
+    if project:
+        project = projects.display_name(project)
+    writer = csv.writer(sys.stdout)
+    writer.writerow([args.by] + list(COLUMNS))
+    for label, period in _rows(aggregator, start, end, args.by, project, projects):
+        # days without intervals of the project aren't listed
+        if (args.by != "project" and project is None) or period["pomodoros"] or period["breaks"]:
+            writer.writerow([label] + [period[column] for column in COLUMNS])
+    return 0
+
+
+def _midnight(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+def _line_start(f, offset):
+    """Returns the start time of the first whole record after offset in the log, or None at the end"""
+    f.seek(offset)
+    if offset:
+        f.readline()
+    for line in f:
+        try:
+            start = record_start(json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+            continue
+        if start is not None:
+            return start
+    return None
+
+
+def iter_stats_between(path, start=None, end=None):
+    """Yields the records of the stats log starting from start up to end (epoch seconds)
+
+    The log is written in start order, so the first record is found by a binary
+    search over byte offsets and reading stops at end. Other stats files are read whole.
+    """
+    if stats_format(path) != "log" or start is None and end is None:
+        yield from iter_any_stats(path)
+        return
+    with open(path, "rb") as f:
+        low, high = 0, f.seek(0, os.SEEK_END)
+        if start is not None:
+            # the last offset whose next record starts before start
+            while high - low > RANGE_BLOCK:
+                middle = (low + high) // 2
+                found = _line_start(f, middle)
+                if found is None or found >= start:
+                    high = middle
+                else:
+                    low = middle
+        f.seek(low)
+        if low:
+            f.readline()
+        for line in f:
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if not isinstance(record, dict):
+                continue
+            if end is not None:
+                ts = record_start(record)
+                if ts is not None and ts >= end:
+                    return
+            yield record
+
+
+def command_export(args):
+    stats_path, _, projects_path = _paths(args)
+    start = None if args.start is None else _midnight(args.start)
+    end = None if args.end is None else _midnight(args.end + timedelta(days=1))
+    projects = ProjectTable.load(projects_path)
+    records = iter_stats_between(
+        stats_path,
+        None if start is None else math.ceil(start.timestamp()),
+        None if end is None else math.ceil(end.timestamp()),
+    )
+    # renamed and deleted projects as in the app
+    records = projects.resolve_records(records)
+    project = args.project
+    if project:
+        project = projects.display_name(project)
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            count = export_records(records, f, args.format, start, end, project)
+    else:
+        count = export_records(records, sys.stdout, args.format, start, end, project)
+    print("{} intervals exported".format(count), file=sys.stderr)
+    return 0
+
+
+def _read_source(path):
+    """Returns the records of a stats file in any format Tomado has written, sorted by start time"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError("no such stats file: {}".format(path))
+    keyed = []
+    for record in iter_any_stats(path):
+        start = record_start(record)
+        if start is not None:
+            keyed.append((start, record))
+    keyed.sort(key=lambda item: item[0])
+    return [record for _, record in keyed]
+
+
+def command_import(args):
+    stats_path, rollup_path, _ = _paths(args)
+    fd, temp_path = tempfile.mkstemp(suffix=".jsonl", dir=os.path.dirname(os.path.abspath(stats_path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            for record in _read_source(args.source):
+                f.write(json.dumps(record) + "\n")
+        inputs = [path for path in (stats_path, temp_path) if os.path.exists(path)]
+        written, duplicates = merge_stats(inputs, stats_path)
+    finally:
+        os.remove(temp_path)
+    # the log was rewritten, the index is rebuilt on the next load
+    if os.path.exists(rollup_path):
+        os.remove(rollup_path)
+    print("{} intervals in the log, {} duplicates dropped".format(written, duplicates))
+    return 0
+
+
+def command_merge(args):
+    written, duplicates = merge_stats(args.inputs, args.output)
+    print("{} intervals written, {} duplicates dropped".format(written, duplicates))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tomado", description="Tomado stats from the command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_file(command):
+        command.add_argument("--file", help="the stats log (default: {})".format(os.path.join(DEFAULT_FOLDER, "stats.jsonl")))
+
+    def add_range(command):
+        command.add_argument("--from", dest="start", type=_day, help="first day, YYYY-MM-DD (default: the first recorded)")
+        command.add_argument("--to", dest="end", type=_day, help="last day, YYYY-MM-DD (default: today)")
+        command.add_argument("--project", help="only this project (\"\" for intervals without one)")
+
+    stats = commands.add_parser("stats", help="totals per day, week or project, as CSV")
+    add_file(stats)
+    add_range(stats)
+    stats.add_argument("--by", choices=("project", "day", "week"), default="day", help="(default: %(default)s)")
+    stats.set_defaults(run=command_stats)
+
+    export = commands.add_parser("export", help="stream the intervals to stdout or a file")
+    add_file(export)
+    add_range(export)
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="csv", help="(default: %(default)s)")
+    export.add_argument("-o", "--output", help="write to this file instead of stdout")
+    export.set_defaults(run=command_export)
+
+    imports = commands.add_parser("import", help="add the intervals of another stats file to the log (quit the app first)")
+    add_file(imports)
+    imports.add_argument("source", help="stats file of any Tomado version")
+    imports.set_defaults(run=command_import)
+
+    merge = commands.add_parser("merge", help="merge stats files sorted by start time into one log")
+    merge.add_argument("output", help="the merged stats log to write")
+    merge.add_argument("inputs", nargs="+", help="stats files of any Tomado version, logs sorted by start time")
+    merge.set_defaults(run=command_merge)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.run(args)
+    except BrokenPipeError:
+        # the reader went away, e.g. `| head`
+        sys.stderr.close()
+        return 0
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
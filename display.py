@@ -0,0 +1,97 @@
+################################################################################
+# Title:    display.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Menu bar render layer. It only touches app.title / app.icon when the text or
+# icon actually changes, and tells the timer when the next visible change is
+# due, so the app wakes up once per second in MM:SS mode, once per minute in
+# minutes mode and never while paused.
+
+import math
+
+from utilities import secs_to_time
+
+DISPLAY_MODES = ("seconds", "minutes")
+# wake up slightly after the change is due, so the new value is already showing
+WAKEUP_SLACK = 0.02
+
+
+def format_remaining(remaining, mode="seconds"):
+    """Formats the remaining seconds of an interval for the menu bar
+
+    Args:
+        remaining (float): seconds left
+        mode (string, optional): 'seconds' for MM:SS or 'minutes' for whole minutes. Defaults to "seconds".
+
+    Returns:
+        string: the menu bar title
+    """
+    if mode == "minutes":
+        return "{}m".format(math.ceil(remaining / 60))
+    return secs_to_time(math.ceil(remaining))
+
+
+def next_change(remaining, mode="seconds"):
+    """Returns the seconds until format_remaining(remaining, mode) shows something else
+
+    The end of the interval (remaining reaching 0) is always a change.
+    """
+    if remaining <= 0:
+        return 0
+    step = 60 if mode == "minutes" else 1
+    shown = math.ceil(remaining / step)
+    return remaining - (shown - 1) * step + WAKEUP_SLACK
+
+
+class MenuBarDisplay(object):
+    """Renders the menu bar title and icon of a rumps.App, skipping no-op assignments
+
+    Args:
+        app (rumps.App): the app whose title and icon are rendered (anything with title/icon attributes)
+        mode (string, optional): one of DISPLAY_MODES. Defaults to "seconds".
+    """
+    def __init__(self, app, mode="seconds"):
+        self.app = app
+        self.mode = mode
+        self._title = None
+        self._icon = None
+        # timer callbacks (show_remaining calls) and actual title/icon assignments
+        self.wakeups = 0
+        self.redraws = 0
+
+    def render(self, title=None, icon=None):
+        """Sets the title and/or icon, unless they already show that value
+
+        Returns:
+            bool: True if anything was redrawn
+        """
+        redrawn = False
+        if title is not None and title != self._title:
+            self.app.title = self._title = title
+            self.redraws += 1
+            redrawn = True
+        if icon is not None and icon != self._icon:
+            self.app.icon = self._icon = icon
+            self.redraws += 1
+            redrawn = True
+        return redrawn
+
+    def show_remaining(self, remaining, icon=None):
+        """Renders the remaining time of the running interval, called on every wakeup
+
+        Returns:
+            float: seconds until the next visible change, see next_change
+        """
+        self.wakeups += 1
+        self.render(format_remaining(remaining, self.mode), icon)
+        return next_change(remaining, self.mode)
@@ -0,0 +1,126 @@
+################################################################################
+# Title:    io_worker.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# A single background thread for the file writes that used to run inside rumps
+# callbacks (stats appends, prefs saves), so a slow or synced disk can't freeze
+# the menu bar. Jobs run in submission order; jobs submitted with a key are
+# coalesced, so only the latest of several queued prefs writes is performed.
+
+import queue
+import threading
+import traceback
+
+_STOP = object()
+
+
+class IOWorker(object):
+    """Runs file writes on a background thread
+
+    Args:
+        maxsize (int, optional): bound of the job queue, submit blocks while it is full. Defaults to 256.
+        dispatch (function, optional): delivers completion callbacks to the UI thread, called as
+            dispatch(callback, result, error), e.g. PyObjCTools.AppHelper.callAfter.
+            Defaults to queueing them for poll().
+    """
+    def __init__(self, maxsize=256, dispatch=None):
+        self.queue = queue.Queue(maxsize)
+        self.dispatch = dispatch or self._queue_completion
+        self._completions = queue.SimpleQueue()
+        # key -> latest job of a coalesced write that is still queued
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        # jobs run and jobs replaced by a later one with the same key
+        self.completed = 0
+        self.coalesced = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tomado-io", daemon=True)
+            self._thread.start()
+
+    def submit(self, func, *args, callback=None, key=None):
+        """Queues func(*args) to run on the worker thread
+
+        Args:
+            func (function): the job
+            *args: its arguments, they must not be mutated by the caller afterwards
+            callback (function, optional): called as callback(result, error) on the UI thread when the job is done
+            key (string, optional): a queued job with the same key is replaced instead of adding another one
+        """
+        job = (func, args, callback)
+        if key is not None:
+            with self._lock:
+                if key in self._pending:
+                    self._pending[key] = job
+                    self.coalesced += 1
+                    return
+                self._pending[key] = job
+            self.queue.put(key)
+        else:
+            self.queue.put(job)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if isinstance(item, tuple):
+                    func, args, callback = item
+                else:
+                    with self._lock:
+                        func, args, callback = self._pending.pop(item)
+                result = error = None
+                try:
+                    result = func(*args)
+                except Exception as e:
+                    error = e
+                    if callback is None:
+                        traceback.print_exc()
+                self.completed += 1
+                if callback is not None:
+                    self.dispatch(callback, result, error)
+            finally:
+                self.queue.task_done()
+
+    def _queue_completion(self, callback, result, error):
+        self._completions.put((callback, result, error))
+
+    def poll(self):
+        """Runs the completion callbacks queued since the last poll (when no dispatch function is given)
+
+        Returns:
+            int: number of callbacks run
+        """
+        count = 0
+        while True:
+            try:
+                callback, result, error = self._completions.get_nowait()
+            except queue.Empty:
+                return count
+            callback(result, error)
+            count += 1
+
+    def flush(self):
+        """Blocks until every queued job has run"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def stop(self):
+        """Runs the queued jobs and stops the thread, e.g. on quit"""
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,150 @@
+################################################################################
+# Title:    menu_model.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Headless menu model. Dynamic menus are described as a tree of MenuNodes and
+# rendered into native rumps menus by diffing against the previously rendered
+# tree: only changed titles, states and callbacks are set, and only added or
+# removed items are allocated or popped. Native menus are only used through
+# item[key] = child, del item[key], .title, .state and .set_callback, so any
+# object with that interface (e.g. a dict subclass) can stand in for rumps.
+
+
+def new_counters():
+    """Returns a dict counting the native menu mutations of one or more renderers"""
+    return dict(created=0, removed=0, moved=0, titles=0, states=0, callbacks=0)
+
+
+def set_title(item, title, counters=None):
+    """Sets the title of a menu item, unless it already has it
+
+    Returns:
+        bool: True if the title was set
+    """
+    if item.title == title:
+        return False
+    item.title = title
+    if counters is not None:
+        counters["titles"] += 1
+    return True
+
+
+def set_state(item, state, counters=None):
+    """Sets the state (checkmark) of a menu item, unless it already has it
+
+    Returns:
+        bool: True if the state was set
+    """
+    if item.state == state:
+        return False
+    item.state = state
+    if counters is not None:
+        counters["states"] += 1
+    return True
+
+
+class MenuNode(object):
+    """A menu item of the model
+
+    Args:
+        key (string): identifies the item between renders, unique among its siblings
+        title (string): the displayed title
+        state (int, optional): 1 for a checkmark. Defaults to 0.
+        callback (function/method, optional): called when the item is clicked
+        children (list of MenuNode, optional): submenu, None for a plain item
+        **attrs: attributes set on the native item when they change, e.g. project_name or icon
+    """
+    __slots__ = ("key", "title", "state", "callback", "children", "attrs")
+
+    def __init__(self, key, title, state=0, callback=None, children=None, **attrs):
+        self.key = key
+        self.title = title
+        self.state = state
+        self.callback = callback
+        self.children = children
+        self.attrs = attrs
+
+
+class MenuRenderer(object):
+    """Keeps the items of a native menu in sync with a list of MenuNodes
+
+    Args:
+        menu (rumps.MenuItem): the native menu whose items are managed
+        factory (function): creates a native item from a MenuNode, e.g. lambda node: rumps.MenuItem(node.title)
+        counters (dict, optional): mutation counters to add to, see new_counters
+    """
+    def __init__(self, menu, factory, counters=None):
+        self.menu = menu
+        self.factory = factory
+        self.counters = counters if counters is not None else new_counters()
+        # key -> native item, in menu order
+        self.items = {}
+        # key -> last rendered MenuNode
+        self.nodes = {}
+        # key -> MenuRenderer of the submenu
+        self.children = {}
+
+    def render(self, nodes):
+        """Updates the native menu to show nodes
+
+        Args:
+            nodes (list of MenuNode): the new items, in order
+        """
+        counters = self.counters
+        new_keys = [node.key for node in nodes]
+        wanted = set(new_keys)
+
+        for key in [key for key in self.items if key not in wanted]:
+            del self.menu[key]
+            del self.items[key]
+            self.nodes.pop(key, None)
+            self.children.pop(key, None)
+            counters["removed"] += 1
+
+        # items keep their place as long as the old order is a prefix of the new one,
+        # everything after the first difference is re-appended
+        kept = list(self.items)
+        prefix = 0
+        while prefix < len(kept) and kept[prefix] == new_keys[prefix]:
+            prefix += 1
+        for key in kept[prefix:]:
+            del self.menu[key]
+
+        for index, node in enumerate(nodes):
+            item = self.items.get(node.key)
+            if item is None:
+                item = self.factory(node)
+                self.items[node.key] = item
+                counters["created"] += 1
+                self.menu[node.key] = item
+            else:
+                if index >= prefix:
+                    self.menu[node.key] = item
+                    counters["moved"] += 1
+                set_title(item, node.title, counters)
+            previous = self.nodes.get(node.key)
+            if previous is None or previous.callback != node.callback:
+                if previous is not None:
+                    counters["callbacks"] += 1
+                    item.set_callback(node.callback)
+            set_state(item, node.state, counters)
+            for name, value in node.attrs.items():
+                if previous is None or previous.attrs.get(name) != value:
+                    setattr(item, name, value)
+            if node.children is not None:
+                if node.key not in self.children:
+                    self.children[node.key] = MenuRenderer(item, self.factory, counters)
+                self.children[node.key].render(node.children)
+            self.nodes[node.key] = node
+        # re-appended items have to follow the dict order of self.items too
+        self.items = {key: self.items[key] for key in new_keys}
@@ -0,0 +1,166 @@
+################################################################################
+# Title:    metrics.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Hot-path instrumentation: call counts and latency histograms per operation.
+# Functions are wrapped with @timed("name") and blocks with
+# `with METRICS.measure("name"):`. Disabled (the default), @timed returns the
+# function itself and measure() returns a shared no-op context. Enabled with
+# `python tomado.py --metrics` or TOMADO_METRICS=1 (read at import, before the
+# decorators run), the numbers can be dumped to metrics.json in the
+# Application Support folder from the menu.
+
+import functools
+import json
+import os
+import sys
+import time
+
+from prefs_store import write_atomic
+
+# histogram bucket i counts the calls that took less than 2**i microseconds (and at least 2**(i-1))
+BUCKETS = 24
+
+
+class OperationStats(object):
+    """Count, total, max and log2 histogram of the latencies of one operation"""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        """Returns the upper bound (in seconds) of the bucket holding the given fraction of the calls"""
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return (1 << i) / 1e6
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            # upper bound in microseconds -> calls
+            "histogram_us": {str(1 << i): count for i, count in enumerate(self.buckets) if count},
+        }
+
+
+class _Measure(object):
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.started)
+
+
+class _NullMeasure(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_MEASURE = _NullMeasure()
+
+
+class Metrics(object):
+    """Latency statistics of named operations
+
+    Args:
+        enabled (bool, optional): whether anything is recorded. Defaults to False.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        # operation name -> OperationStats
+        self.operations = {}
+        self.started = time.time()
+
+    def record(self, name, seconds):
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats()
+        stats.add(seconds)
+
+    def measure(self, name):
+        """Returns a context manager timing its block as the operation name"""
+        if not self.enabled:
+            return _NULL_MEASURE
+        return _Measure(self, name)
+
+    def timed(self, name):
+        """Decorator timing every call of the function as the operation name
+
+        Disabled when decorating, the function is returned unwrapped and never timed.
+        """
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - started)
+            return wrapper
+        return decorate
+
+    def reset(self):
+        self.operations = {}
+        self.started = time.time()
+
+    def snapshot(self):
+        """Returns the statistics of every operation as a JSON-serializable dict"""
+        return {
+            "since": self.started,
+            "operations": {name: stats.to_dict() for name, stats in sorted(self.operations.items())},
+        }
+
+    def dump(self, path):
+        """Writes the snapshot to a JSON file"""
+        write_atomic(path, json.dumps(self.snapshot(), indent=2))
+
+
+# the instance used by the app
+METRICS = Metrics(enabled=bool(os.environ.get("TOMADO_METRICS")) or "--metrics" in sys.argv[1:])
+timed = METRICS.timed
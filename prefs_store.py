@@ -0,0 +1,158 @@
+################################################################################
+# Title:    prefs_store.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Debounced, atomic persistence of prefs.json. Handlers mark the prefs as
+# changed; changes made within `delay` seconds of each other are written once,
+# to a temp file that is renamed over prefs.json, so a crash mid-write leaves
+# the previous file intact. A write whose JSON equals the file on disk is
+# skipped. fsync, the expensive part on a synced disk, only happens on flush
+# (quit) or when fsync_interval seconds have passed since the last one.
+
+import json
+import os
+import threading
+import time
+
+
+def write_atomic(path, text, fsync=False):
+    """Replaces the content of a file with text, through a temp file and a rename
+
+    Args:
+        path (string): the path of the file
+        text (string): the new content
+        fsync (bool, optional): flush the file to disk before the rename. Defaults to False.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class PrefsStore(object):
+    """Saves a prefs dict to its JSON file, batching and skipping redundant writes
+
+    Args:
+        path (string): the prefs file
+        data (dict): the prefs, mutated in place by the app; call changed() after mutating it
+        delay (float, optional): seconds to wait for more changes before writing. Defaults to 1.
+        fsync_interval (float, optional): fsync a debounced write if the last fsync is older than this,
+            None to fsync only on flush(). Defaults to None.
+        worker (IOWorker, optional): runs the writes, they run on the debounce timer thread otherwise
+        callback (function, optional): passed to the worker, called as callback(result, error) after each write
+    """
+    def __init__(self, path, data, delay=1.0, fsync_interval=None, worker=None, callback=None):
+        self.path = path
+        self.data = data
+        self.delay = delay
+        self.fsync_interval = fsync_interval
+        self.worker = worker
+        self.callback = callback
+        # serialized prefs waiting for the debounce timer, None when there are none
+        self._pending = None
+        self._timer = None
+        self._lock = threading.Lock()
+        # content of the file on disk, only touched by the thread doing the writes
+        try:
+            with open(path) as f:
+                self._saved = f.read()
+        except (FileNotFoundError, UnicodeDecodeError):
+            self._saved = None
+        self._last_fsync = time.monotonic()
+        # whether the last write reached the disk with fsync (a file left by an earlier run counts as synced)
+        self._synced = True
+        # writes performed and writes skipped because nothing changed
+        self.writes = 0
+        self.skipped = 0
+
+    @property
+    def dirty(self):
+        """Whether there are changes that are not written yet"""
+        return self._pending is not None
+
+    def changed(self):
+        """Marks the prefs as changed, they are written once no more changes come for `delay` seconds"""
+        # serialized here, on the thread mutating the prefs, so the write never sees a half-made change
+        text = json.dumps(self.data, indent=2)
+        with self._lock:
+            self._pending = text
+            # every change restarts the wait
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._debounced)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _take_pending(self):
+        with self._lock:
+            text, self._pending = self._pending, None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return text
+
+    def _debounced(self):
+        text = self._take_pending()
+        if text is None:
+            return
+        fsync = self.fsync_interval is not None and time.monotonic() - self._last_fsync >= self.fsync_interval
+        if self.worker is not None:
+            self.worker.submit(self._write, text, fsync, key="prefs", callback=self.callback)
+        else:
+            self._write(text, fsync)
+
+    def _write(self, text, fsync):
+        """Writes text unless the file already holds it
+
+        Returns:
+            bool: True if the file was written
+        """
+        if text == self._saved:
+            self.skipped += 1
+            return False
+        write_atomic(self.path, text, fsync)
+        self._saved = text
+        self.writes += 1
+        self._synced = fsync
+        if fsync:
+            self._last_fsync = time.monotonic()
+        return True
+
+    def _sync(self):
+        """fsyncs the file if the last write wasn't"""
+        if self._synced:
+            return
+        with open(self.path) as f:
+            os.fsync(f.fileno())
+        self._synced = True
+        self._last_fsync = time.monotonic()
+
+    def flush(self):
+        """Writes pending changes now, with fsync, e.g. on quit
+
+        Without pending changes, the last write is fsynced if it wasn't.
+        With a worker the write is queued behind its other jobs, stop or flush the worker afterwards.
+        """
+        text = self._take_pending()
+        if self.worker is not None:
+            if text is not None:
+                self.worker.submit(self._write, text, True, key="prefs", callback=self.callback)
+            # also after a write skipped as unchanged, when the file holds an earlier unsynced write
+            self.worker.submit(self._sync)
+        else:
+            if text is not None:
+                self._write(text, True)
+            self._sync()
@@ -0,0 +1,246 @@
+################################################################################
+# Title:    records.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Interval records and their start times. Records keep their start as epoch
+# seconds ("ts") next to the readable one, and LocalDays maps those to local
+# days without a datetime per record. Project names are interned in a
+# ProjectTable, so renaming or deleting a project is one table update and is
+# reflected by every record of its history.
+
+import json
+import os
+from datetime import datetime, time, timedelta
+
+TYPES = ("pomodoro", "break", "long")
+POMODORO, BREAK, LONG = range(len(TYPES))
+
+
+def type_code(interval_type):
+    """Returns the code of an interval type, unknown types count as breaks"""
+    if interval_type == "pomodoro":
+        return POMODORO
+    if interval_type == "long":
+        return LONG
+    return BREAK
+
+
+def local_midnight(day):
+    """Returns the epoch second of the local midnight starting a datetime.date (DST aware)"""
+    return int(datetime.combine(day, time()).timestamp())
+
+
+def record_start(record):
+    """Returns the start of a stats log record in epoch seconds, None if it has no valid start
+
+    Records carry it as the int "ts"; older ones only have the ISO "start", which is parsed.
+    """
+    ts = record.get("ts")
+    if type(ts) is int:
+        return ts
+    try:
+        return int(datetime.fromisoformat(record["start"]).timestamp())
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def make_record(interval_type, ts, duration, project=""):
+    """Returns a record in the stats log format, with the start both as epoch seconds (ts) and readable (start)"""
+    return {
+        "type": interval_type,
+        "start": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+        "ts": ts,
+        "duration": duration,
+        "project": project,
+    }
+
+
+class LocalDays(object):
+    """Maps epoch seconds to local dates and wall clock times without building a datetime per record
+
+    The bounds of the last day seen are cached, so records in start order hit the
+    cache and cost two int comparisons. Day bounds come from local_midnight, so
+    days around DST changes (23 or 25 hours long) are handled by the time zone rules.
+    """
+    __slots__ = ("start", "end", "date", "uniform")
+
+    def __init__(self):
+        self.start = self.end = 0
+        self.date = None
+        # no DST change within the cached day, so its wall clock is the offset from midnight
+        self.uniform = False
+
+    def _load(self, ts):
+        day = datetime.fromtimestamp(ts).date()
+        self.date = day
+        self.start = local_midnight(day)
+        self.end = local_midnight(day + timedelta(days=1))
+        self.uniform = self.end - self.start == 86400
+
+    def day(self, ts):
+        """Returns the local datetime.date of an epoch second"""
+        if not self.start <= ts < self.end:
+            self._load(ts)
+        return self.date
+
+    def wall_seconds(self, ts):
+        """Returns the local wall clock time of an epoch second, in seconds since midnight"""
+        if not self.start <= ts < self.end:
+            self._load(ts)
+        if self.uniform:
+            return ts - self.start
+        moment = datetime.fromtimestamp(ts)
+        return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+class ProjectTable(object):
+    """Interns project names as small ints
+
+    Every name ever recorded keeps its id. Renaming points the id at the new
+    name and deleting blanks it, so old records follow both without being
+    rewritten. Id 0 is "no project".
+
+    Args:
+        path (string, optional): JSON file the table is saved to by save()
+    """
+    def __init__(self, path=None):
+        self.path = path
+        # id -> current name ("" for no project and deleted projects)
+        self.names = [""]
+        # every recorded name -> id
+        self.ids = {"": 0}
+
+    @classmethod
+    def load(cls, path):
+        """Loads a table saved by save(), or returns an empty one"""
+        table = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            names, ids = data["names"], data["ids"]
+            if isinstance(names, list) and isinstance(ids, dict) and names and names[0] == "":
+                table.names, table.ids = names, ids
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            pass
+        return table
+
+    def add_missing(self, names):
+        """Adds the projects that aren't in the table yet, e.g. the ones created before it existed
+
+        Returns:
+            bool: True if a project was added
+        """
+        missing = [name for name in names if name not in self.ids]
+        for name in missing:
+            self.intern(name)
+        return bool(missing)
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"names": self.names, "ids": self.ids}, f)
+        os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Returns the id of a recorded project name, adding it if it is new"""
+        project_id = self.ids.get(name)
+        if project_id is None:
+            project_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return project_id
+
+    def is_taken(self, name, old_name=None):
+        """Returns True if name was recorded for another project, whose intervals it still holds
+
+        Such a name can't be given to a new project, or to the project renamed from old_name,
+        as the intervals recorded under it would be merged with the other project's.
+        A deleted project can be revived under its own name by add().
+        """
+        project_id = self.ids.get(name)
+        if not project_id:
+            return False
+        if old_name is not None:
+            return project_id != self.ids.get(old_name)
+        return self.names[project_id] not in ("", name)
+
+    def add(self, name):
+        """Adds a project created by the user, reviving it if it was deleted before
+
+        Returns:
+            int: the id of the project
+
+        Raises:
+            ValueError: if the name is taken, see is_taken()
+        """
+        if self.is_taken(name):
+            raise ValueError("project name {!r} is recorded for {!r}".format(name, self.display_name(name)))
+        project_id = self.intern(name)
+        self.names[project_id] = name
+        return project_id
+
+    def name(self, project_id):
+        """Returns the current name of a project id"""
+        return self.names[project_id]
+
+    def display_name(self, name):
+        """Returns the current name of a recorded project name"""
+        project_id = self.ids.get(name)
+        return name if project_id is None else self.names[project_id]
+
+    def rename(self, old_name, new_name):
+        """Renames a project, including all of its recorded intervals, in O(1)
+
+        Raises:
+            ValueError: if new_name is taken, see is_taken()
+        """
+        if self.is_taken(new_name, old_name):
+            raise ValueError("project name {!r} is recorded for another project".format(new_name))
+        project_id = self.intern(old_name)
+        self.names[project_id] = new_name
+        self.ids[new_name] = project_id
+
+    def delete(self, name):
+        """Deletes a project, its recorded intervals now count as having no project, in O(1)"""
+        # also a project created before the table existed
+        project_id = self.intern(name)
+        if project_id:
+            self.names[project_id] = ""
+
+    def resolve_records(self, records):
+        """Yields interval records with their project as currently named ("" for deleted projects),
+        e.g. to export them as the menu shows them
+        """
+        for record in records:
+            project = record.get("project", "")
+            name = self.display_name(project)
+            yield record if name == project else dict(record, project=name)
+
+    def resolve(self, by_project):
+        """Maps the by_project dict of a stats period (keyed by recorded names) to current names
+
+        Renamed projects are merged into their new name and deleted ones are dropped.
+        """
+        resolved = {}
+        for recorded, data in by_project.items():
+            name = self.display_name(recorded)
+            if not name:
+                continue
+            if name not in resolved:
+                resolved[name] = dict(data)
+            else:
+                for key, value in data.items():
+                    resolved[name][key] += value
+        return resolved
@@ -0,0 +1,93 @@
+################################################################################
+# Title:    session.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+from array import array
+
+
+class Session(object):
+    """A session: the schedule of intervals, a cursor at the loaded one and the time spent in each
+
+    Every lookup is O(1), however long the schedule is.
+
+    Args:
+        schedule (list of strings): interval names in order, e.g. ["pomodoro", "break", ..., "long_break"];
+            the type of an interval is the part of its name before the first "_"
+    """
+    __slots__ = ("types", "index", "elapsed", "_pomodoros_from", "_done")
+
+    def __init__(self, schedule):
+        self.types = tuple(name.split("_")[0] for name in schedule)
+        # number of pomodoros from each position to the end, for the session clock string
+        counts = array("l", [0] * (len(self.types) + 1))
+        for i in range(len(self.types) - 1, -1, -1):
+            counts[i] = counts[i + 1] + (self.types[i] == "pomodoro")
+        self._pomodoros_from = counts
+        self.reset()
+
+    def reset(self):
+        """Starts the session over"""
+        self.index = 0
+        # seconds spent in each interval, -1 while it has not been completed or skipped
+        self.elapsed = array("l", [-1] * len(self.types))
+        # pomodoros completed or skipped so far
+        self._done = 0
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def over(self):
+        return self.index >= len(self.types)
+
+    @property
+    def current_type(self):
+        """The loaded interval type (pomodoro, break, long), False once the session is over"""
+        if self.index >= len(self.types):
+            return False
+        return self.types[self.index]
+
+    @property
+    def current_type_text(self):
+        """The loaded interval type meant for the user (Pomodoro, Break, Long Break), False once the session is over"""
+        interval_type = self.current_type
+        if interval_type is False:
+            return False
+        return "Long Break" if interval_type == "long" else interval_type.capitalize()
+
+    def finish(self, elapsed):
+        """Records the time spent in the loaded interval and moves to the next one
+
+        Args:
+            elapsed (int): seconds spent in the interval
+        """
+        if self.index >= len(self.types):
+            return
+        self.elapsed[self.index] = elapsed
+        if self.types[self.index] == "pomodoro":
+            self._done += 1
+        self.index += 1
+
+    def clock(self, running, full, half, empty):
+        """Renders one symbol per pomodoro: full for the finished ones, half for the running one, empty for the rest
+
+        Args:
+            running (bool): whether the loaded interval is running
+            full, half, empty (string): the symbols
+        """
+        upcoming = self._pomodoros_from[min(self.index, len(self.types))]
+        current = ""
+        if self.current_type == "pomodoro":
+            current = half if running else empty
+            upcoming -= 1
+        return full * self._done + current + empty * upcoming
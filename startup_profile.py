@@ -0,0 +1,73 @@
+################################################################################
+# Title:    startup_profile.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Per-phase timing of the app start, printed by `python tomado.py --profile-startup`.
+# Disabled profiles only cost a flag check per phase.
+
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile(object):
+    """Collects the duration of the startup phases
+
+    Args:
+        enabled (bool, optional): whether phases are timed. Defaults to False.
+        started (float, optional): time.perf_counter() at the start of the process. Defaults to now.
+    """
+    def __init__(self, enabled=False, started=None):
+        self.enabled = enabled
+        self.started = time.perf_counter() if started is None else started
+        # (phase, seconds), in the order the phases ended
+        self.phases = []
+        # (event, seconds since started)
+        self.marks = []
+        self._last_split = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Times the block as the phase name"""
+        if not self.enabled:
+            yield
+            return
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - began))
+
+    def split(self, name):
+        """Records the time since the previous split (or the creation of the profile) as the phase name,
+        for timing consecutive sections of straight-line code"""
+        now = time.perf_counter()
+        if self.enabled:
+            self.phases.append((name, now - self._last_split))
+        self._last_split = now
+
+    def add(self, name, seconds):
+        """Records a phase timed elsewhere"""
+        if self.enabled:
+            self.phases.append((name, seconds))
+
+    def mark(self, name):
+        """Records the time since the start of the process, e.g. when the menu bar is first painted"""
+        if self.enabled:
+            self.marks.append((name, time.perf_counter() - self.started))
+
+    def report(self):
+        """Returns the timings as a printable table"""
+        lines = ["{:<16} {:>10}".format("phase", "ms")]
+        lines += ["{:<16} {:>10.1f}".format(name, seconds * 1000) for name, seconds in self.phases]
+        lines += ["{:<16} {:>10.1f}".format("at " + name, seconds * 1000) for name, seconds in self.marks]
+        return "\n".join(lines)
@@ -0,0 +1,250 @@
+################################################################################
+# Title:    stats_columnar.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Optional binary stats store. Every record field lives in its own fixed-width
+# column file, which is memory-mapped and read through memoryview, so nothing
+# is deserialized to answer a query:
+#
+#   start.bin     int64   start time, epoch seconds
+#   duration.bin  uint32  length in seconds
+#   type.bin      uint8   index into TYPES
+#   project.bin   uint16  index into projects.json (0 is "no project")
+#
+# Columns use the native byte order of the machine that wrote them.
+
+import bisect
+import csv
+import json
+import math
+import mmap
+import os
+from array import array
+from datetime import timedelta
+
+from records import TYPES, LocalDays, local_midnight, make_record, record_start, type_code
+from utilities import _add_to_period, _empty_period, read_stats
+
+_COLUMNS = (
+    ("start", "q"),
+    ("duration", "I"),
+    ("type", "B"),
+    ("project", "H"),
+)
+
+
+class ColumnarStats(object):
+    """A directory of column files holding interval records sorted by start time.
+
+    Use as a context manager, or call close() when done, to release the memory maps.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.projects_path = os.path.join(path, "projects.json")
+        try:
+            with open(self.projects_path) as f:
+                self.projects = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.projects = [""]
+        self._project_ids = {name: i for i, name in enumerate(self.projects)}
+        self._maps = []
+        self.columns = {}
+        self._map_columns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._length
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + ".bin")
+
+    def _map_columns(self):
+        self.close()
+        lengths = []
+        for name, typecode in _COLUMNS:
+            path = self._column_path(name)
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            view = memoryview(b"").cast(typecode)
+            if os.path.getsize(path):
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                usable = len(mapped) - len(mapped) % view.itemsize
+                view = memoryview(mapped)[:usable].cast(typecode)
+            self.columns[name] = view
+            lengths.append(len(view))
+        # a torn append leaves some columns one record longer, the extra is ignored and cut off by extend()
+        self._length = min(lengths)
+
+    def close(self):
+        """Releases the memory maps"""
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+        self._length = 0
+
+    def project_id(self, project):
+        """Returns the id of a project name, adding it to the project table if needed"""
+        if project not in self._project_ids:
+            self._project_ids[project] = len(self.projects)
+            self.projects.append(project)
+            save_projects = self.projects_path + ".tmp"
+            with open(save_projects, "w") as f:
+                json.dump(self.projects, f)
+            os.replace(save_projects, self.projects_path)
+        return self._project_ids[project]
+
+    def extend(self, records):
+        """Appends interval records (dicts as in the stats log); they must not start before the last stored one
+
+        Returns:
+            int: number of records appended
+
+        Raises:
+            ValueError: if the records aren't in start order, range() relies on it
+        """
+        values = {name: array(typecode) for name, typecode in _COLUMNS}
+        last = self.columns["start"][self._length - 1] if self._length else None
+        for record in records:
+            start = record_start(record)
+            if start is None:
+                continue
+            if last is not None and start < last:
+                raise ValueError("records must be appended in start order")
+            last = start
+            values["start"].append(start)
+            values["duration"].append(int(record.get("duration", 0)))
+            values["type"].append(type_code(record.get("type")))
+            values["project"].append(self.project_id(record.get("project", "")))
+        length = self._length
+        self.close()
+        for name, typecode in _COLUMNS:
+            with open(self._column_path(name), "ab") as f:
+                # drops what a torn append left past the last whole record
+                f.truncate(length * values[name].itemsize)
+                values[name].tofile(f)
+        self._map_columns()
+        return len(values["start"])
+
+    def range(self, start, end):
+        """Finds the records starting in [start, end) by binary search over the start column
+
+        Args:
+            start (datetime): beginning of the range
+            end (datetime): end of the range (exclusive)
+
+        Returns:
+            tuple: (first index, index after the last)
+        """
+        starts = self.columns["start"]
+        # records start on whole seconds
+        lo = bisect.bisect_left(starts, math.ceil(start.timestamp()), 0, self._length)
+        hi = bisect.bisect_left(starts, math.ceil(end.timestamp()), lo, self._length)
+        return lo, hi
+
+    def records(self, lo=0, hi=None):
+        """Yields records from index lo to hi as dicts in the stats log format"""
+        hi = self._length if hi is None else min(hi, self._length)
+        columns = self.columns
+        for i in range(lo, hi):
+            yield make_record(TYPES[columns["type"][i]], columns["start"][i], columns["duration"][i],
+                              self.projects[columns["project"][i]])
+
+    def compute_stats(self, today, lo=0, hi=None):
+        """Same result as utilities.compute_stats, computed over the columns of records lo to hi
+
+        Args:
+            today (datetime.date): the reference date
+        """
+        hi = self._length if hi is None else min(hi, self._length)
+        today_start = local_midnight(today)
+        today_end = local_midnight(today + timedelta(days=1))
+        week_start = local_midnight(today - timedelta(days=today.weekday()))
+
+        result_today, result_week, result_all_time = _empty_period(), _empty_period(), _empty_period()
+        projects = self.projects
+        columns = zip(
+            self.columns["start"][lo:hi],
+            self.columns["duration"][lo:hi],
+            self.columns["type"][lo:hi],
+            self.columns["project"][lo:hi],
+        )
+        for start, duration, code, project_id in columns:
+            itype = "pomodoro" if code == 0 else "break"
+            project = projects[project_id]
+            _add_to_period(result_all_time, project, itype, duration)
+            if start < week_start:
+                continue
+            _add_to_period(result_week, project, itype, duration)
+            if today_start <= start < today_end:
+                _add_to_period(result_today, project, itype, duration)
+        return {"today": result_today, "week": result_week, "all_time": result_all_time}
+
+    def export_stats(self, f, lo=0, hi=None):
+        """Writes records lo to hi as CSV, in the columns of Tomado.export_stats
+
+        Args:
+            f (file): text file opened with newline=""
+        """
+        hi = self._length if hi is None else min(hi, self._length)
+        writer = csv.writer(f)
+        writer.writerow(["date", "time", "type", "duration_seconds", "duration_minutes", "project"])
+        columns = zip(
+            self.columns["start"][lo:hi],
+            self.columns["duration"][lo:hi],
+            self.columns["type"][lo:hi],
+            self.columns["project"][lo:hi],
+        )
+        days = LocalDays()
+        for start, duration, code, project_id in columns:
+            seconds = days.wall_seconds(start)
+            writer.writerow([
+                days.day(start).isoformat(),
+                "{:02d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60),
+                TYPES[code],
+                duration,
+                round(duration / 60, 2),
+                self.projects[project_id],
+            ])
+
+
+def convert_stats(stats_path, columns_path):
+    """Converts a stats file (log or JSON list) into a new columnar store
+
+    Args:
+        stats_path (string): path of the stats file
+        columns_path (string): directory of the columnar store, must not exist yet
+
+    Returns:
+        int: number of records converted
+    """
+    if os.path.exists(columns_path):
+        raise FileExistsError(columns_path)
+    records = []
+    for record in read_stats(stats_path):
+        start = record_start(record)
+        if start is not None:
+            records.append((start, record))
+    records.sort(key=lambda item: item[0])
+    with ColumnarStats(columns_path) as store:
+        return store.extend(record for _, record in records)
@@ -0,0 +1,137 @@
+################################################################################
+# Title:    stats_merge.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Merges the stats of several machines into one history. The input logs are
+# each sorted by start time (as the stats log is written), so they are streamed
+# through a k-way heap merge: memory holds one record per file plus the keys of
+# the current second, however long the histories are. The files of earlier
+# versions (a JSON list or the weekly format) are read whole and sorted.
+# Intervals recorded in more than one file (e.g. a copied history) are written once.
+#
+#   python -m stats_merge combined.jsonl mac1/stats.jsonl mac2/stats.jsonl
+
+import argparse
+import heapq
+import json
+import os
+import sys
+
+from records import record_start
+from utilities import iter_any_stats, iter_stats, stats_format
+
+# records buffered before each write
+MERGE_CHUNK = 1000
+
+
+def _sorted_records(path):
+    """Yields the records of a stats file in start order, streaming a log and checking its order"""
+    if stats_format(path) == "log":
+        last = None
+        for record in iter_stats(path):
+            start = record_start(record)
+            if start is None:
+                continue
+            if last is not None and start < last:
+                raise ValueError("{} is not sorted by start time".format(path))
+            last = start
+            yield start, record
+        return
+    keyed = []
+    for record in iter_any_stats(path):
+        start = record_start(record)
+        if start is not None:
+            keyed.append((start, record))
+    keyed.sort(key=lambda item: item[0])
+    yield from keyed
+
+
+def _keyed(path):
+    """Yields ((start, type, duration, project), record) of a stats file in start order
+
+    Raises:
+        FileNotFoundError: if there is no such file
+        ValueError: if a log is not sorted by start time, or a non-empty file holds no intervals
+    """
+    empty = True
+    for start, record in _sorted_records(path):
+        empty = False
+        if "ts" not in record:
+            record = dict(record, ts=start)
+        yield (start, record.get("type", ""), record.get("duration", 0), record.get("project", "")), record
+    if empty and os.path.getsize(path):
+        raise ValueError("{} is not a Tomado stats file".format(path))
+
+
+def merge_stats(paths, out_path):
+    """Merges stats files sorted by start time into one stats log, dropping duplicate intervals
+
+    Intervals are duplicates when their start, type, duration and project are equal.
+    The log is written to a temp file first and renamed, so out_path may be one of the inputs.
+
+    Args:
+        paths (list of strings): the stats files (logs, or the JSON list and weekly files of earlier
+            versions, which are read whole)
+        out_path (string): the merged stats log
+
+    Returns:
+        tuple: (records written, duplicates dropped)
+
+    Raises:
+        FileNotFoundError: if an input file doesn't exist
+        ValueError: if an input log is not sorted by start time, or an input file holds no intervals Tomado can read
+    """
+    merged = heapq.merge(*(_keyed(path) for path in paths), key=lambda item: item[0])
+    written = duplicates = 0
+    # keys of the records written with the current start second
+    current_start, seen = None, set()
+    temp_path = out_path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            chunk = []
+            for key, record in merged:
+                if key[0] != current_start:
+                    current_start, seen = key[0], set()
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                chunk.append(json.dumps(record) + "\n")
+                written += 1
+                if len(chunk) >= MERGE_CHUNK:
+                    f.write("".join(chunk))
+                    chunk = []
+            f.write("".join(chunk))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    os.replace(temp_path, out_path)
+    return written, duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merges the Tomado stats of several machines")
+    parser.add_argument("output", help="the merged stats log to write")
+    parser.add_argument("inputs", nargs="+", help="stats files of any Tomado version, logs sorted by start time")
+    args = parser.parse_args(argv)
+    try:
+        written, duplicates = merge_stats(args.inputs, args.output)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print("{} intervals written, {} duplicates dropped".format(written, duplicates))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
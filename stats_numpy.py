@@ -0,0 +1,149 @@
+################################################################################
+# Title:    stats_numpy.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Vectorized compute_stats for large histories (multi-year team exports).
+# NumPy is optional: without it every function here falls back to the pure
+# Python engine in utilities.
+
+from datetime import datetime, time, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utilities import compute_stats as compute_stats_python
+
+
+def load_arrays(stats):
+    """Loads a flat list of interval records into NumPy arrays
+
+    Start times are kept as naive local seconds, which compare directly with
+    the local dates the records were written in.
+
+    Args:
+        stats: flat list of interval records
+
+    Returns:
+        dict: 'start', 'duration', 'is_pomodoro' and 'project' (codes into 'projects') arrays
+    """
+    starts = [record.get("start") for record in stats]
+    try:
+        start = np.array(starts, dtype="datetime64[s]")
+        valid = ~np.isnat(start)
+    except (TypeError, ValueError):
+        # some record has a malformed start, validate them one by one like compute_stats does
+        start = np.empty(len(starts), dtype="datetime64[s]")
+        valid = np.zeros(len(starts), dtype=bool)
+        for i, value in enumerate(starts):
+            try:
+                start[i] = datetime.fromisoformat(value).replace(tzinfo=None)
+                valid[i] = True
+            except (TypeError, ValueError):
+                pass
+    duration = np.fromiter((record.get("duration", 0) for record in stats), dtype=np.int64, count=len(stats))
+    is_pomodoro = np.fromiter((record.get("type") == "pomodoro" for record in stats), dtype=bool, count=len(stats))
+    projects, project = np.unique(
+        np.array([record.get("project", "") for record in stats], dtype=str), return_inverse=True
+    )
+    return {
+        "start": start[valid].astype(np.int64),
+        "duration": duration[valid],
+        "is_pomodoro": is_pomodoro[valid],
+        "project": project.reshape(-1)[valid],
+        "projects": [str(name) for name in projects],
+        "local": True,
+    }
+
+
+def columnar_arrays(store):
+    """Wraps the columns of a stats_columnar.ColumnarStats as NumPy arrays without copying them"""
+    n = len(store)
+    return {
+        "start": np.frombuffer(store.columns["start"], dtype=np.int64, count=n),
+        "duration": np.frombuffer(store.columns["duration"], dtype=np.uint32, count=n).astype(np.int64),
+        "is_pomodoro": np.frombuffer(store.columns["type"], dtype=np.uint8, count=n) == 0,
+        "project": np.frombuffer(store.columns["project"], dtype=np.uint16, count=n),
+        "projects": store.projects,
+        "local": False,
+    }
+
+
+def _midnight(day, local):
+    if local:
+        return int(np.datetime64(day, "s").astype(np.int64))
+    return int(datetime.combine(day, time()).timestamp())
+
+
+def _period(mask, arrays):
+    duration = arrays["duration"]
+    pomodoro = mask & arrays["is_pomodoro"]
+    brk = mask & ~arrays["is_pomodoro"]
+    result = dict(
+        pomodoros=int(np.count_nonzero(pomodoro)),
+        pomodoro_time=int(duration[pomodoro].sum()),
+        breaks=int(np.count_nonzero(brk)),
+        break_time=int(duration[brk].sum()),
+        by_project={},
+    )
+    n_projects = len(arrays["projects"])
+    project = arrays["project"]
+    pomodoros = np.bincount(project[pomodoro], minlength=n_projects)
+    pomodoro_time = np.bincount(project[pomodoro], weights=duration[pomodoro], minlength=n_projects)
+    breaks = np.bincount(project[brk], minlength=n_projects)
+    break_time = np.bincount(project[brk], weights=duration[brk], minlength=n_projects)
+    for i in np.flatnonzero(pomodoros + breaks):
+        name = arrays["projects"][i]
+        if not name:
+            continue
+        result["by_project"][name] = dict(
+            pomodoros=int(pomodoros[i]),
+            pomodoro_time=int(pomodoro_time[i]),
+            breaks=int(breaks[i]),
+            break_time=int(break_time[i]),
+        )
+    return result
+
+
+def compute_stats_arrays(arrays, today):
+    """Same result as utilities.compute_stats, computed with masked sums over the arrays of load_arrays or columnar_arrays
+
+    Args:
+        arrays (dict): the record arrays
+        today (datetime.date): the reference date
+    """
+    start = arrays["start"]
+    local = arrays["local"]
+    today_start = _midnight(today, local)
+    today_end = _midnight(today + timedelta(days=1), local)
+    week_start = _midnight(today - timedelta(days=today.weekday()), local)
+
+    in_week = start >= week_start
+    return {
+        "today": _period((start >= today_start) & (start < today_end), arrays),
+        "week": _period(in_week, arrays),
+        "all_time": _period(np.ones(len(start), dtype=bool), arrays),
+    }
+
+
+def compute_stats(stats, today):
+    """Drop-in replacement of utilities.compute_stats, vectorized when NumPy is installed
+
+    Args:
+        stats: flat list of interval records
+        today (datetime.date): the reference date
+    """
+    if np is None:
+        return compute_stats_python(stats, today)
+    return compute_stats_arrays(load_arrays(stats), today)
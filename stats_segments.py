@@ -0,0 +1,423 @@
+################################################################################
+# Title:    stats_segments.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Optional segmented stats storage. The history is split into one log per
+# month (or year), so an append only touches the active segment and a torn
+# write can only damage that one. A manifest keeps the count, time span and
+# totals of every segment: all-time stats are merged from those summaries and
+# today/week stats only read the segments reaching into the current week.
+#
+#   stats/
+#     manifest.json
+#     2026-09.jsonl
+#     2026-10.jsonl
+#
+# Closed segments older than a given age can be archived into compressed cold
+# segments (gzip or lzma). A cold segment is one line of JSON, its summary
+# header, followed by the compressed log, so its totals can be read without
+# decompressing it, and queries only decompress the cold segments they touch,
+# as a stream.
+#
+#   python -m stats_segments migrate stats.jsonl stats/ --by month
+#   python -m stats_segments compact stats/
+#   python -m stats_segments archive stats/ --older-than 365 --compression lzma
+
+import argparse
+import gzip
+import io
+import json
+import lzma
+import os
+import sys
+from datetime import date, timedelta
+
+from prefs_store import write_atomic
+from records import LocalDays, local_midnight, record_start
+from utilities import (_add_to_period, _copy_period, _empty_period, _merge_period, append_record,
+                       compute_stats, iter_stats)
+
+MANIFEST_VERSION = 1
+GRANULARITIES = ("month", "year")
+SEGMENT_SUFFIX = ".jsonl"
+# compression -> suffix of cold segments
+COLD_SUFFIXES = {"gzip": ".seg.gz", "lzma": ".seg.xz"}
+COLD_VERSION = 1
+
+
+def _open_compressed(f, compression, mode):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=f, mode=mode)
+    return lzma.LZMAFile(f, mode=mode)
+
+
+def _empty_summary():
+    return {"count": 0, "first": None, "last": None, "bytes": 0, "totals": _empty_period()}
+
+
+def _add_to_summary(summary, ts, record):
+    summary["count"] += 1
+    if summary["first"] is None or ts < summary["first"]:
+        summary["first"] = ts
+    if summary["last"] is None or ts > summary["last"]:
+        summary["last"] = ts
+    itype = "pomodoro" if record.get("type") == "pomodoro" else "break"
+    _add_to_period(summary["totals"], record.get("project", ""), itype, record.get("duration", 0))
+
+
+class SegmentedStats(object):
+    """Stats log split into time-based segments, with a manifest of per-segment summaries
+
+    Args:
+        folder (string): the segments folder, created if it doesnt exist
+        granularity (string, optional): "month" or "year", for a new folder. Defaults to "month".
+            An existing folder keeps the granularity of its manifest.
+    """
+    def __init__(self, folder, granularity="month"):
+        if granularity not in GRANULARITIES:
+            raise ValueError("unknown segment granularity: {}".format(granularity))
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.manifest_path = os.path.join(folder, "manifest.json")
+        self.granularity = granularity
+        # segment name -> summary (count, first, last, bytes, totals)
+        self.segments = {}
+        self._local_days = LocalDays()
+        self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION and manifest.get("granularity") in GRANULARITIES:
+                self.granularity = manifest["granularity"]
+                self.segments = manifest["segments"]
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError, KeyError):
+            pass
+        # segments written without a manifest update (crash, or an older manifest) are summarized again
+        stale = False
+        files = self._segment_files()
+        for name, compression in files.items():
+            summary = self.segments.get(name)
+            if (summary is None or summary.get("compression") != compression
+                    or summary.get("bytes") != os.path.getsize(self.segment_path(name, compression))):
+                self.segments[name] = self._summarize(name, compression)
+                stale = True
+        for name in [name for name in self.segments if name not in files]:
+            del self.segments[name]
+            stale = True
+        if stale:
+            self.save()
+
+    def _segment_files(self):
+        """Returns segment name -> compression (None for plain segments) of the segment files in the folder"""
+        files = {}
+        for entry in sorted(os.listdir(self.folder)):
+            if entry.endswith(SEGMENT_SUFFIX):
+                files[entry[:-len(SEGMENT_SUFFIX)]] = None
+            for compression, suffix in COLD_SUFFIXES.items():
+                if entry.endswith(suffix):
+                    files[entry[:-len(suffix)]] = compression
+        return files
+
+    def _summarize(self, name, compression=None):
+        if compression is not None:
+            summary = self.read_header(name, compression)
+        else:
+            summary = _empty_summary()
+            for record in iter_stats(self.segment_path(name)):
+                ts = record_start(record)
+                if ts is not None:
+                    _add_to_summary(summary, ts, record)
+        summary["bytes"] = os.path.getsize(self.segment_path(name, compression))
+        return summary
+
+    def read_header(self, name, compression):
+        """Returns the summary stored in the header of a cold segment, without decompressing it"""
+        with open(self.segment_path(name, compression), "rb") as f:
+            header = json.loads(f.readline())
+        summary = header["summary"]
+        summary["compression"] = compression
+        return summary
+
+    def _iter_segment(self, name):
+        """Yields the records of a segment, stream-decompressing a cold one"""
+        compression = self.segments[name].get("compression")
+        if compression is None:
+            yield from iter_stats(self.segment_path(name))
+            return
+        with open(self.segment_path(name, compression), "rb") as f:
+            f.readline()
+            with io.TextIOWrapper(_open_compressed(f, compression, "rb")) as lines:
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(record, dict):
+                        yield record
+
+    def save(self):
+        """Writes the manifest"""
+        write_atomic(self.manifest_path, json.dumps({
+            "version": MANIFEST_VERSION,
+            "granularity": self.granularity,
+            "segments": dict(sorted(self.segments.items())),
+        }))
+
+    def segment_path(self, name, compression=None):
+        """Returns the path of a plain segment, or of a cold one with the given compression"""
+        return os.path.join(self.folder, name + (COLD_SUFFIXES[compression] if compression else SEGMENT_SUFFIX))
+
+    def segment_name(self, ts):
+        """Returns the name of the segment holding a start time (epoch seconds), e.g. 2026-10 or 2026"""
+        day = self._local_days.day(ts)
+        if self.granularity == "year":
+            return "{:04d}".format(day.year)
+        return "{:04d}-{:02d}".format(day.year, day.month)
+
+    def __len__(self):
+        return sum(summary["count"] for summary in self.segments.values())
+
+    def append(self, record, save=True):
+        """Appends a record to its segment and updates the summary of that segment
+
+        Args:
+            record (dict): record in the stats log format
+            save (bool, optional): write the manifest too. Defaults to True.
+
+        Returns:
+            bool: False if the record has no valid start and was ignored
+        """
+        ts = record_start(record)
+        if ts is None:
+            return False
+        name = self.segment_name(ts)
+        if self.segments.get(name, {}).get("compression"):
+            self._thaw(name)
+        summary = self.segments.setdefault(name, _empty_summary())
+        summary["bytes"] = append_record(self.segment_path(name), record)
+        _add_to_summary(summary, ts, record)
+        if save:
+            self.save()
+        return True
+
+    def records(self, start=None, end=None):
+        """Yields the records starting in [start, end), reading only the segments that overlap it
+
+        Args:
+            start (int, optional): epoch second, None for no lower bound
+            end (int, optional): epoch second, None for no upper bound
+        """
+        for name, summary in sorted(self.segments.items()):
+            if not summary["count"]:
+                continue
+            if (start is not None and summary["last"] < start) or (end is not None and summary["first"] >= end):
+                continue
+            for record in self._iter_segment(name):
+                ts = record_start(record)
+                if ts is None or (start is not None and ts < start) or (end is not None and ts >= end):
+                    continue
+                yield record
+
+    def all_time(self):
+        """Returns the all-time totals, merged from the segment summaries without reading any segment"""
+        result = _empty_period()
+        for summary in self.segments.values():
+            _merge_period(result, summary["totals"])
+        return result
+
+    def compute_stats(self, today):
+        """Same result as utilities.compute_stats, reading only the segments reaching into this week
+
+        Args:
+            today (datetime.date): the reference date
+        """
+        week_start = local_midnight(today - timedelta(days=today.weekday()))
+        recent = compute_stats(self.records(start=week_start), today)
+        return {"today": recent["today"], "week": recent["week"], "all_time": _copy_period(self.all_time())}
+
+    def compact(self):
+        """Rewrites every plain segment sorted by start time, without duplicate, torn or invalid records,
+        and rebuilds its summary. Empty segments are removed.
+
+        Returns:
+            tuple: (records kept, records dropped)
+        """
+        kept = dropped = 0
+        for name in list(self.segments):
+            # cold segments were compacted when they were archived
+            if self.segments[name].get("compression"):
+                kept += self.segments[name]["count"]
+                continue
+            path = self.segment_path(name)
+            # (start, type, duration, project) -> (start, record), the first of duplicate intervals is kept
+            lines = {}
+            total = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    total += 1
+                    try:
+                        record = json.loads(line)
+                        ts = record_start(record)
+                    except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                        continue
+                    if ts is None:
+                        continue
+                    key = (ts, record.get("type", ""), record.get("duration", 0), record.get("project", ""))
+                    lines.setdefault(key, (ts, record))
+            ordered = sorted(lines.values(), key=lambda item: item[0])
+            dropped += total - len(ordered)
+            kept += len(ordered)
+            if not ordered:
+                os.remove(path)
+                del self.segments[name]
+                continue
+            write_atomic(path, "".join(json.dumps(record) + "\n" for _, record in ordered))
+            self.segments[name] = self._summarize(name)
+        self.save()
+        return kept, dropped
+
+    def archive(self, older_than=365, compression="gzip", today=None):
+        """Compresses the plain segments whose last interval is older than a number of days into cold segments
+
+        Segments are compacted first. The active segment (the one of today) is never archived.
+
+        Args:
+            older_than (int, optional): age in days. Defaults to 365.
+            compression (string, optional): "gzip" or "lzma". Defaults to "gzip".
+            today (datetime.date, optional): the reference date. Defaults to today.
+
+        Returns:
+            list: (segment name, plain bytes, cold bytes) of every archived segment
+        """
+        if compression not in COLD_SUFFIXES:
+            raise ValueError("unknown compression: {}".format(compression))
+        today = today or date.today()
+        cutoff = local_midnight(today - timedelta(days=older_than))
+        active = self.segment_name(local_midnight(today))
+        closed = [name for name, summary in sorted(self.segments.items())
+                  if not summary.get("compression") and name != active and summary["count"] and summary["last"] < cutoff]
+        if not closed:
+            return []
+        self.compact()
+        archived = []
+        for name in closed:
+            if name not in self.segments:
+                continue
+            plain_path = self.segment_path(name)
+            cold_path = self.segment_path(name, compression)
+            summary = {key: value for key, value in self.segments[name].items() if key not in ("bytes", "compression")}
+            header = {"tomado_segment": COLD_VERSION, "compression": compression, "summary": summary}
+            temp_path = cold_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                with _open_compressed(f, compression, "wb") as packed, open(plain_path, "rb") as plain:
+                    while True:
+                        block = plain.read(1 << 20)
+                        if not block:
+                            break
+                        packed.write(block)
+            os.replace(temp_path, cold_path)
+            plain_bytes = os.path.getsize(plain_path)
+            os.remove(plain_path)
+            self.segments[name] = self._summarize(name, compression)
+            archived.append((name, plain_bytes, self.segments[name]["bytes"]))
+        self.save()
+        return archived
+
+    def _thaw(self, name):
+        """Turns a cold segment back into a plain one, e.g. to append a late interval to it"""
+        compression = self.segments[name]["compression"]
+        temp_path = self.segment_path(name) + ".tmp"
+        with open(temp_path, "w") as f:
+            for record in self._iter_segment(name):
+                f.write(json.dumps(record) + "\n")
+        os.replace(temp_path, self.segment_path(name))
+        os.remove(self.segment_path(name, compression))
+        self.segments[name] = self._summarize(name)
+
+
+def migrate_segments(stats_path, folder, granularity="month"):
+    """Splits a stats file (log or JSON list of earlier versions) into a new segments folder
+
+    Args:
+        stats_path (string): the stats file
+        folder (string): the segments folder, must not exist yet
+        granularity (string, optional): "month" or "year". Defaults to "month".
+
+    Returns:
+        int: number of records migrated
+    """
+    if os.path.exists(folder):
+        raise FileExistsError(folder)
+    store = SegmentedStats(folder, granularity)
+    # open segment name -> file, the log is in start order so segments are written one after another
+    files = {}
+    count = 0
+    try:
+        for record in iter_stats(stats_path):
+            ts = record_start(record)
+            if ts is None:
+                continue
+            name = store.segment_name(ts)
+            if name not in files:
+                files[name] = open(store.segment_path(name), "a")
+                store.segments.setdefault(name, _empty_summary())
+            files[name].write(json.dumps(record) + "\n")
+            _add_to_summary(store.segments[name], ts, record)
+            count += 1
+    finally:
+        for f in files.values():
+            f.close()
+    for name in files:
+        store.segments[name]["bytes"] = os.path.getsize(store.segment_path(name))
+    store.save()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Segmented Tomado stats storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="split a stats file into a new segments folder")
+    migrate.add_argument("stats", help="the stats file (stats.jsonl or stats.json)")
+    migrate.add_argument("folder", help="the segments folder to create")
+    migrate.add_argument("--by", choices=GRANULARITIES, default="month", help="segment length (default: %(default)s)")
+    compact = commands.add_parser("compact", help="sort and deduplicate every segment, rebuild the manifest")
+    compact.add_argument("folder", help="the segments folder")
+    archive = commands.add_parser("archive", help="compress old segments into cold segments")
+    archive.add_argument("folder", help="the segments folder")
+    archive.add_argument("--older-than", type=int, default=365, metavar="DAYS",
+                         help="archive segments whose last interval is older (default: %(default)s)")
+    archive.add_argument("--compression", choices=sorted(COLD_SUFFIXES), default="gzip",
+                         help="(default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        try:
+            count = migrate_segments(args.stats, args.folder, args.by)
+        except FileExistsError as e:
+            print("already exists: {}".format(e), file=sys.stderr)
+            return 1
+        print("{} intervals migrated".format(count))
+    elif args.command == "compact":
+        kept, dropped = SegmentedStats(args.folder).compact()
+        print("{} intervals kept, {} dropped".format(kept, dropped))
+    else:
+        for name, plain_bytes, cold_bytes in SegmentedStats(args.folder).archive(args.older_than, args.compression):
+            print("{}: {:,} -> {:,} bytes".format(name, plain_bytes, cold_bytes))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+################################################################################
+# Title:    stats_sqlite.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Optional stats backend on sqlite3 (standard library). Intervals are rows of
+# one table indexed on start time, type and project, and the stats periods are
+# answered by SQL aggregations, so a query reads only the index range of its
+# period instead of parsing the whole history. The database runs in WAL mode,
+# an append is one insert of a single cached statement. An interval is stored
+# once per start, type and project, so importing a file again adds nothing.
+
+import sqlite3
+from datetime import timedelta
+
+from records import POMODORO, TYPES, local_midnight, make_record, record_start, type_code
+from utilities import _empty_period, iter_any_stats
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    start INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    project TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS intervals_type ON intervals (type, start);
+CREATE INDEX IF NOT EXISTS intervals_project ON intervals (project, start);
+"""
+
+# the unique index, also the one of start time range queries; created by _ensure_unique
+_UNIQUE = """
+DROP INDEX IF EXISTS intervals_start;
+CREATE UNIQUE INDEX IF NOT EXISTS intervals_unique ON intervals (start, type, project);
+"""
+# keeps the first of the rows a database of an earlier version stored twice
+_DEDUPE = """
+DELETE FROM intervals WHERE id NOT IN (SELECT MIN(id) FROM intervals GROUP BY start, type, project)
+"""
+
+_INSERT = "INSERT OR IGNORE INTO intervals (start, duration, type, project) VALUES (?, ?, ?, ?)"
+
+# counts and durations of pomodoros and breaks per project, {where} narrows it to a period
+_PERIOD = """
+SELECT project, type = {pomodoro} AS is_pomodoro, COUNT(*), TOTAL(duration)
+FROM intervals {where}
+GROUP BY project, is_pomodoro
+"""
+
+
+def _row(record):
+    """Returns the (start, duration, type, project) row of a record in the stats log format, None if it has no valid start"""
+    start = record_start(record)
+    if start is None:
+        return None
+    return (start, int(record.get("duration", 0)), type_code(record.get("type")), record.get("project", "") or "")
+
+
+class SQLiteStats(object):
+    """Interval records in a SQLite database
+
+    Use as a context manager, or call close() when done.
+
+    Args:
+        path (string): the database file, created if it doesnt exist
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent on a crash with NORMAL, only the last commits can be lost on power failure
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._ensure_unique()
+
+    def _ensure_unique(self):
+        """Creates the unique index, removing the duplicates of a database created without it"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'intervals_unique'").fetchone()
+        if exists:
+            return
+        with self.conn:
+            self.conn.execute(_DEDUPE)
+        self.conn.executescript(_UNIQUE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM intervals").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, record):
+        """Inserts one record in the stats log format (dict), in its own transaction
+
+        Returns:
+            bool: False if the record has no valid start or is already stored, and was ignored
+        """
+        row = _row(record)
+        if row is None:
+            return False
+        with self.conn:
+            return self.conn.execute(_INSERT, row).rowcount == 1
+
+    def extend(self, records):
+        """Inserts records in the stats log format in one transaction
+
+        Returns:
+            int: number of records inserted, not counting the ones already stored
+        """
+        rows = [row for row in map(_row, records) if row is not None]
+        changes = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(_INSERT, rows)
+        return self.conn.total_changes - changes
+
+    def records(self, start=None, end=None):
+        """Yields the records starting in [start, end) in start order, as dicts in the stats log format
+
+        Args:
+            start (int, optional): epoch second, None for no lower bound
+            end (int, optional): epoch second, None for no upper bound
+        """
+        where, params = self._where(start, end)
+        cursor = self.conn.execute(
+            "SELECT start, duration, type, project FROM intervals {} ORDER BY start, id".format(where), params)
+        for start, duration, code, project in cursor:
+            yield make_record(TYPES[code], start, duration, project)
+
+    @staticmethod
+    def _where(start, end):
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("start >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("start < ?")
+            params.append(end)
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def period(self, start=None, end=None):
+        """Aggregates the records starting in [start, end) into a stats period
+
+        Args:
+            start (int, optional): epoch second, None for no lower bound
+            end (int, optional): epoch second, None for no upper bound
+
+        Returns:
+            dict: pomodoros, pomodoro_time, breaks, break_time, by_project (as in utilities.compute_stats)
+        """
+        where, params = self._where(start, end)
+        period = _empty_period()
+        for project, is_pomodoro, count, duration in self.conn.execute(
+                _PERIOD.format(pomodoro=POMODORO, where=where), params):
+            duration = int(duration)
+            count_key, time_key = ("pomodoros", "pomodoro_time") if is_pomodoro else ("breaks", "break_time")
+            period[count_key] += count
+            period[time_key] += duration
+            if project:
+                if project not in period["by_project"]:
+                    period["by_project"][project] = dict(pomodoros=0, pomodoro_time=0, breaks=0, break_time=0)
+                period["by_project"][project][count_key] += count
+                period["by_project"][project][time_key] += duration
+        return period
+
+    def compute_stats(self, today):
+        """Same result as utilities.compute_stats, answered by three aggregation queries
+
+        Args:
+            today (datetime.date): the reference date
+        """
+        today_start = local_midnight(today)
+        week_start = local_midnight(today - timedelta(days=today.weekday()))
+        return {
+            "today": self.period(today_start, local_midnight(today + timedelta(days=1))),
+            "week": self.period(week_start),
+            "all_time": self.period(),
+        }
+
+
+def import_stats(stats_path, store):
+    """Imports a stats file into a SQLite store
+
+    Reads the append-only log, the JSON array of earlier versions and the weekly format of the first versions.
+
+    Args:
+        stats_path (string): path of the stats file
+        store (SQLiteStats): the store to insert into
+
+    Returns:
+        int: number of records imported, the ones already in the store are skipped
+    """
+    return store.extend(iter_any_stats(stats_path))
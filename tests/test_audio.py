@@ -0,0 +1,66 @@
+################################################################################
+# Title:    tests/test_audio.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import unittest
+
+from audio import BUTTON_SOUND, NullBackend, SoundBank
+
+SOUNDS = ["sounds/beep.mp3", "sounds/birds.mp3", "sounds/ding.mp3", "sounds/cicadas.mp3", "sounds/wood.mp3"]
+
+
+class SoundBankTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = NullBackend()
+
+    def test_repeated_plays_load_once(self):
+        bank = SoundBank(self.backend)
+        for _ in range(20):
+            bank.play(BUTTON_SOUND, 1)
+        self.assertEqual(self.backend.loads, [BUTTON_SOUND])
+        self.assertEqual(bank.loads, 1)
+        self.assertEqual(len(self.backend.plays), 20)
+
+    def test_preload_then_play_does_not_load(self):
+        bank = SoundBank(self.backend)
+        bank.preload(SOUNDS)
+        bank.play(SOUNDS[0], 1)
+        self.assertEqual(self.backend.loads, SOUNDS)
+        self.assertIs(bank.get(SOUNDS[0]), bank.get(SOUNDS[0]))
+
+    def test_volume_is_only_set_when_it_changes(self):
+        bank = SoundBank(self.backend)
+        for volume in (1, 1, 0.5, 0.5, 0.5, 1):
+            bank.play(BUTTON_SOUND, volume)
+        self.assertEqual(self.backend.volumes, [(BUTTON_SOUND, 1), (BUTTON_SOUND, 0.5), (BUTTON_SOUND, 1)])
+        self.assertEqual([volume for _, volume in self.backend.plays], [1, 1, 0.5, 0.5, 0.5, 1])
+
+    def test_least_recently_used_sound_is_evicted_past_capacity(self):
+        bank = SoundBank(self.backend, capacity=2)
+        bank.play(SOUNDS[0], 1)
+        bank.play(SOUNDS[1], 1)
+        # SOUNDS[0] is now the most recently used
+        bank.play(SOUNDS[0], 1)
+        bank.play(SOUNDS[2], 1)
+        self.assertEqual((len(bank), bank.evictions), (2, 1))
+        bank.play(SOUNDS[0], 1)
+        self.assertEqual(bank.loads, 3)
+        # SOUNDS[1] was evicted and is loaded again
+        bank.play(SOUNDS[1], 1)
+        self.assertEqual(self.backend.loads, [SOUNDS[0], SOUNDS[1], SOUNDS[2], SOUNDS[1]])
+        self.assertEqual(bank.evictions, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
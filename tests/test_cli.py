@@ -0,0 +1,146 @@
+################################################################################
+# Title:    tests/test_cli.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+import cli
+from benchmarks.synthetic import write_history
+from records import ProjectTable, make_record
+from utilities import stats_format
+
+WEEKLY = {
+    "2022_20": {
+        "05.20._18:52:42-05.20._20:00:00": {
+            "pomodoro_05.20._18:52:42": 1500,
+            "break_05.20._19:17:42": 300,
+            "pomodoro_05.20._19:22:42": 1500,
+        },
+    },
+}
+
+
+class CommandLineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.end = datetime.combine(date.today(), datetime.min.time())
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            code = cli.main(list(argv))
+        return code, out.getvalue().splitlines()
+
+    def test_stats_format(self):
+        write_history(self.path("stats.jsonl"), 10)
+        write_history(self.path("stats.json"), 10, legacy=True)
+        with open(self.path("weekly.json"), "w") as f:
+            json.dump(WEEKLY, f, indent=4)
+        open(self.path("empty.jsonl"), "w").close()
+        self.assertEqual(stats_format(self.path("stats.jsonl")), "log")
+        self.assertEqual(stats_format(self.path("stats.json")), "list")
+        self.assertEqual(stats_format(self.path("weekly.json")), "weekly")
+        self.assertEqual(stats_format(self.path("empty.jsonl")), "log")
+
+    def test_stats_reads_every_format_without_writing_the_index(self):
+        write_history(self.path("stats.jsonl"), 500, days=30, end=self.end)
+        write_history(self.path("stats.json"), 500, days=30, end=self.end, legacy=True)
+        reports = [self.run_cli("stats", "--file", self.path(name), "--by", "week")
+                   for name in ("stats.jsonl", "stats.json")]
+        self.assertEqual(reports[0], reports[1])
+        code, lines = reports[0]
+        self.assertEqual(code, 0)
+        self.assertEqual(sum(int(line.split(",")[1]) for line in lines[1:]), 250)
+        self.assertEqual(sorted(os.listdir(self.folder)), ["stats.json", "stats.jsonl"])
+
+    def test_stats_of_a_weekly_file(self):
+        with open(self.path("weekly.json"), "w") as f:
+            json.dump(WEEKLY, f, indent=4)
+        code, lines = self.run_cli("stats", "--file", self.path("weekly.json"), "--by", "day")
+        self.assertEqual((code, lines), (0, ["day,pomodoros,pomodoro_time,breaks,break_time",
+                                             "2022-05-20,2,3000,1,300"]))
+
+    def test_export_range_matches_a_full_read(self):
+        write_history(self.path("stats.jsonl"), 20000, days=400, end=self.end)
+        first = (self.end - timedelta(days=100)).date().isoformat()
+        last = (self.end - timedelta(days=40)).date().isoformat()
+        _, ranged = self.run_cli("export", "--file", self.path("stats.jsonl"), "--from", first, "--to", last)
+        _, everything = self.run_cli("export", "--file", self.path("stats.jsonl"))
+        expected = [line for line in everything[1:] if first <= line[:10] <= last]
+        self.assertEqual(ranged[1:], expected)
+        self.assertTrue(expected)
+
+    def test_export_resolves_renamed_and_deleted_projects(self):
+        projects = ProjectTable(self.path("projects.json"))
+        for name in ("A", "Gone"):
+            projects.add(name)
+        projects.rename("A", "Work")
+        projects.delete("Gone")
+        projects.save()
+        with open(self.path("stats.jsonl"), "w") as f:
+            for ts, project in ((1000, "A"), (2000, "Work"), (3000, "Gone"), (4000, "")):
+                f.write(json.dumps(make_record("pomodoro", ts, 60, project)) + "\n")
+        _, lines = self.run_cli("export", "--file", self.path("stats.jsonl"), "--format", "jsonl")
+        self.assertEqual([json.loads(line)["project"] for line in lines], ["Work", "Work", "", ""])
+        # the old name selects the project too
+        _, lines = self.run_cli("export", "--file", self.path("stats.jsonl"), "--format", "jsonl", "--project", "A")
+        self.assertEqual([json.loads(line)["ts"] for line in lines], [1000, 2000])
+
+    def test_merge_of_a_weekly_file(self):
+        with open(self.path("weekly.json"), "w") as f:
+            json.dump(WEEKLY, f, indent=4)
+        with open(self.path("stats.jsonl"), "w") as f:
+            # the weekly break, recorded again by the log, and a later pomodoro
+            for record in ({"type": "break", "start": "2022-05-20T19:17:42", "duration": 300, "project": ""},
+                           make_record("pomodoro", 2000000000, 1500, "Work")):
+                f.write(json.dumps(record) + "\n")
+        code, lines = self.run_cli("merge", self.path("merged.jsonl"), self.path("stats.jsonl"), self.path("weekly.json"))
+        self.assertEqual((code, lines), (0, ["4 intervals written, 1 duplicates dropped"]))
+        self.assertEqual(stats_format(self.path("merged.jsonl")), "log")
+        with open(self.path("merged.jsonl")) as f:
+            merged = [json.loads(line) for line in f]
+        self.assertEqual([(record["type"], record["start"]) for record in merged],
+                         [("pomodoro", "2022-05-20T18:52:42"), ("break", "2022-05-20T19:17:42"),
+                          ("pomodoro", "2022-05-20T19:22:42"), ("pomodoro", merged[-1]["start"])])
+        self.assertEqual(merged[-1]["ts"], 2000000000)
+
+    def test_missing_files_are_errors(self):
+        self.assertEqual(self.run_cli("stats", "--file", self.path("none.jsonl"))[0], 1)
+        self.assertEqual(self.run_cli("import", "--file", self.path("stats.jsonl"), self.path("none.json"))[0], 1)
+
+    def test_merge_of_unreadable_files_is_an_error(self):
+        with open(self.path("notes.txt"), "w") as f:
+            f.write("not stats\n")
+        write_history(self.path("stats.jsonl"), 10)
+        for name in ("notes.txt", "none.json"):
+            code, _ = self.run_cli("merge", self.path("merged.jsonl"), self.path("stats.jsonl"), self.path(name))
+            self.assertEqual(code, 1, name)
+            self.assertFalse(os.path.exists(self.path("merged.jsonl")), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
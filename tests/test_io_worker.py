@@ -0,0 +1,107 @@
+################################################################################
+# Title:    tests/test_io_worker.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# The UI thread side of the IO worker must not wait for the disk. A slow file
+# system is simulated by jobs that sleep before writing.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from io_worker import IOWorker
+from utilities import append_record, iter_stats
+
+# seconds a simulated write takes
+SLOW_WRITE = 0.2
+# seconds the UI thread may spend in submit() or poll()
+BUDGET = 0.02
+
+
+def slow_append(path, record):
+    time.sleep(SLOW_WRITE)
+    return append_record(path, record)
+
+
+class IOWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.path = os.path.join(self.folder, "stats.jsonl")
+        self.worker = IOWorker()
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+        shutil.rmtree(self.folder)
+
+    def timed(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.assertLess(time.perf_counter() - started, BUDGET)
+        return result
+
+    def test_submit_and_poll_do_not_wait_for_slow_writes(self):
+        done = []
+        for i in range(5):
+            self.timed(self.worker.submit, slow_append, self.path, {"ts": i},
+                       callback=lambda result, error: done.append((result, error)))
+        # the first write is still sleeping
+        self.assertEqual(self.timed(self.worker.poll), 0)
+        self.worker.flush()
+        self.assertEqual(self.timed(self.worker.poll), 5)
+        self.assertTrue(all(error is None for _, error in done))
+        # callbacks get the result of the job, here the size of the log
+        self.assertEqual(done[-1][0], os.path.getsize(self.path))
+        self.assertEqual([record["ts"] for record in iter_stats(self.path)], list(range(5)))
+
+    def test_callbacks_run_on_the_polling_thread(self):
+        threads = []
+        self.worker.submit(slow_append, self.path, {"ts": 0},
+                           callback=lambda result, error: threads.append(threading.current_thread()))
+        self.worker.flush()
+        self.worker.poll()
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_errors_are_delivered_to_the_callback(self):
+        errors = []
+
+        def failing():
+            time.sleep(SLOW_WRITE)
+            raise OSError("disk full")
+
+        self.timed(self.worker.submit, failing, callback=lambda result, error: errors.append(error))
+        self.worker.flush()
+        self.worker.poll()
+        self.assertIsInstance(errors[0], OSError)
+
+    def test_keyed_writes_are_coalesced_while_the_disk_is_busy(self):
+        written = []
+
+        def write(text):
+            time.sleep(SLOW_WRITE)
+            written.append(text)
+
+        self.worker.submit(write, "first")
+        for i in range(10):
+            self.timed(self.worker.submit, write, "prefs {}".format(i), key="prefs")
+        self.worker.flush()
+        self.assertEqual(written, ["first", "prefs 9"])
+        self.assertEqual(self.worker.coalesced, 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
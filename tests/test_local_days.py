@@ -0,0 +1,117 @@
+################################################################################
+# Title:    tests/test_local_days.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# LocalDays and the epoch-second stats against datetime, across DST changes
+# under fixed time zones (including half-hour changes and changes at midnight).
+
+import os
+import random
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from records import LocalDays, local_midnight, make_record, record_start
+from utilities import compute_stats
+
+ZONES = ("Europe/Prague", "America/New_York", "Australia/Lord_Howe", "America/Sao_Paulo", "UTC")
+YEARS = (2018, 2024)
+# seconds between the checked moments around each change
+STEP = 600
+
+
+def transitions(year):
+    """Returns the epoch seconds at which the UTC offset of the current time zone changes in a year"""
+    start = int(datetime(year, 1, 1).timestamp())
+    end = int(datetime(year + 1, 1, 1).timestamp())
+    changes = []
+    offset = _offset(start)
+    for ts in range(start, end, 1800):
+        if _offset(ts) != offset:
+            offset = _offset(ts)
+            changes.append(ts)
+    return changes
+
+
+def _offset(ts):
+    return time.localtime(ts).tm_gmtoff
+
+
+@unittest.skipUnless(hasattr(time, "tzset"), "needs time.tzset")
+class LocalDaysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tz = os.environ.get("TZ")
+
+    def tearDown(self):
+        if self.tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = self.tz
+        time.tzset()
+
+    def zones(self):
+        """Yields each time zone with the moments around its DST changes, set as the local time zone"""
+        for zone in ZONES:
+            os.environ["TZ"] = zone
+            time.tzset()
+            moments = []
+            for year in YEARS:
+                changes = transitions(year) or [int(datetime(year, 6, 1).timestamp())]
+                for change in changes:
+                    moments.extend(range(change - 2 * 86400, change + 2 * 86400, STEP))
+            yield zone, moments
+
+    def test_day_and_wall_seconds_match_datetime(self):
+        for zone, moments in self.zones():
+            # in start order, as records are read, and shuffled, which misses the cache
+            shuffled = list(moments)
+            random.Random(0).shuffle(shuffled)
+            for order in (moments, shuffled):
+                local_days = LocalDays()
+                for ts in order:
+                    moment = datetime.fromtimestamp(ts)
+                    self.assertEqual(local_days.day(ts), moment.date(), (zone, ts))
+                    self.assertEqual(local_days.wall_seconds(ts),
+                                     moment.hour * 3600 + moment.minute * 60 + moment.second, (zone, ts))
+
+    def test_day_bounds_hold_their_day(self):
+        for zone, moments in self.zones():
+            for ts in moments[::12]:
+                day = datetime.fromtimestamp(ts).date()
+                self.assertLessEqual(local_midnight(day), ts, (zone, ts))
+                self.assertLess(ts, local_midnight(day + timedelta(days=1)), (zone, ts))
+
+    def test_record_start_reads_both_formats(self):
+        for zone, moments in self.zones():
+            for ts in moments:
+                record = make_record("pomodoro", ts, 1500)
+                self.assertEqual(record_start(record), ts)
+                legacy = dict(record)
+                del legacy["ts"]
+                parsed = record_start(legacy)
+                # the ISO start of the repeated hour of a change back can be read as either of the two
+                self.assertEqual(datetime.fromtimestamp(parsed).isoformat(timespec="seconds"), record["start"])
+                self.assertIn(parsed - ts, (0, -3600, -1800, 1800, 3600), (zone, ts))
+
+    def test_compute_stats_days_match_datetime(self):
+        for zone, moments in self.zones():
+            records = [make_record("pomodoro", ts, 60) for ts in moments]
+            days = sorted({datetime.fromtimestamp(ts).date() for ts in moments})
+            for today in days:
+                expected = sum(1 for ts in moments if datetime.fromtimestamp(ts).date() == today)
+                self.assertEqual(compute_stats(records, today)["today"]["pomodoros"], expected, (zone, today))
+
+
+if __name__ == "__main__":
+    unittest.main()
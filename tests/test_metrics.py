@@ -0,0 +1,42 @@
+################################################################################
+# Title:    tests/test_metrics.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import unittest
+
+from metrics import Metrics
+
+
+def work(value):
+    return value * 2
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_disabled_timed_returns_the_function(self):
+        metrics = Metrics()
+        self.assertIs(metrics.timed("work")(work), work)
+
+    def test_enabled_timed_records_calls(self):
+        metrics = Metrics(enabled=True)
+        timed_work = metrics.timed("work")(work)
+        self.assertEqual([timed_work(i) for i in range(3)], [0, 2, 4])
+        self.assertEqual(metrics.snapshot()["operations"]["work"]["count"], 3)
+        # turned off later, the wrapper stops recording
+        metrics.enabled = False
+        timed_work(3)
+        self.assertEqual(metrics.operations["work"].count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
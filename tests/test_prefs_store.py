@@ -0,0 +1,98 @@
+################################################################################
+# Title:    tests/test_prefs_store.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from io_worker import IOWorker
+from prefs_store import PrefsStore
+
+
+class PrefsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.path = os.path.join(self.folder, "prefs.json")
+        self.prefs = {"pomodoro_length": 1500}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def wait_for_write(self, store, writes):
+        deadline = time.monotonic() + 2
+        while store.writes < writes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(store.writes, writes)
+
+    def test_changes_are_debounced_into_one_write(self):
+        store = PrefsStore(self.path, self.prefs, delay=0.05)
+        for length in (600, 900, 1200):
+            self.prefs["pomodoro_length"] = length
+            store.changed()
+        self.wait_for_write(store, 1)
+        self.assertFalse(store.dirty)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"pomodoro_length": 1200})
+        # the same prefs again are not written
+        store.changed()
+        store.flush()
+        self.assertEqual((store.writes, store.skipped), (1, 1))
+
+    def test_each_change_restarts_the_delay(self):
+        store = PrefsStore(self.path, self.prefs, delay=0.2)
+        started = time.monotonic()
+        # changes keep coming for longer than the delay
+        while time.monotonic() - started < 0.5:
+            self.prefs["pomodoro_length"] += 1
+            store.changed()
+            time.sleep(0.05)
+        self.assertEqual(store.writes, 0)
+        self.wait_for_write(store, 1)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), self.prefs)
+
+    def test_flush_fsyncs_a_completed_debounced_write(self):
+        store = PrefsStore(self.path, self.prefs, delay=0.05)
+        with mock.patch("os.fsync", wraps=os.fsync) as fsync:
+            store.changed()
+            self.wait_for_write(store, 1)
+            self.assertEqual(fsync.call_count, 0)
+            # quit after the write is done, nothing is pending
+            store.flush()
+            self.assertEqual(fsync.call_count, 1)
+            store.flush()
+            self.assertEqual(fsync.call_count, 1)
+
+    def test_flush_fsyncs_pending_changes_through_the_worker(self):
+        worker = IOWorker()
+        worker.start()
+        store = PrefsStore(self.path, self.prefs, delay=60, worker=worker)
+        with mock.patch("os.fsync", wraps=os.fsync) as fsync:
+            self.prefs["pomodoro_length"] = 600
+            store.changed()
+            store.flush()
+            worker.stop()
+            self.assertEqual(fsync.call_count, 1)
+        self.assertEqual(store.writes, 1)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"pomodoro_length": 600})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+################################################################################
+# Title:    tests/test_recent.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from records import make_record
+from utilities import append_record, read_recent, skip_records
+
+
+class ReadRecentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.path = os.path.join(self.folder, "stats.jsonl")
+        self.records = [make_record("pomodoro", 1000 + i, 60, "x" * (i % 7)) for i in range(50)]
+        for i, record in enumerate(self.records):
+            append_record(self.path, record)
+            if i % 10 == 3:
+                # a record torn by a crash, skipped by both functions
+                with open(self.path, "a") as f:
+                    f.write('{"type": "pom')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_pages_cover_the_log_newest_first(self):
+        read, offset = read_recent(self.path, 7)
+        while offset:
+            page, offset = read_recent(self.path, 7, offset)
+            read.extend(page)
+        self.assertEqual(read, self.records[::-1])
+
+    def test_skip_records_moves_a_page_end_forward(self):
+        read, offset = read_recent(self.path, 20)
+        # the 5 oldest of the page were dropped, they are read back first
+        offset = skip_records(self.path, offset, 5)
+        page, _ = read_recent(self.path, 8, offset)
+        self.assertEqual(page, self.records[34:26:-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
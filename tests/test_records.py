@@ -0,0 +1,92 @@
+################################################################################
+# Title:    tests/test_records.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import unittest
+
+from records import ProjectTable
+
+
+def totals(**pomodoros):
+    """Returns a by_project dict keyed by recorded names, with only pomodoro counts"""
+    return {name: {"pomodoros": count} for name, count in pomodoros.items()}
+
+
+class ProjectTableTest(unittest.TestCase):
+
+    def test_rename_keeps_history(self):
+        table = ProjectTable()
+        table.add("A")
+        table.rename("A", "Work")
+        self.assertEqual(table.resolve(totals(A=2, Work=3)), {"Work": {"pomodoros": 5}})
+        # and back again, the old name belongs to the same project
+        table.rename("Work", "A")
+        self.assertEqual(table.resolve(totals(A=2, Work=3)), {"A": {"pomodoros": 5}})
+
+    def test_old_name_of_renamed_project_is_taken(self):
+        table = ProjectTable()
+        table.add("A")
+        table.rename("A", "Work")
+        self.assertTrue(table.is_taken("A"))
+        with self.assertRaises(ValueError):
+            table.add("A")
+        # the history stays with Work
+        self.assertEqual(table.resolve(totals(A=2, Work=3)), {"Work": {"pomodoros": 5}})
+        table.add("B")
+        self.assertTrue(table.is_taken("A", "B"))
+        with self.assertRaises(ValueError):
+            table.rename("B", "A")
+        self.assertNotEqual(table.intern("B"), table.intern("Work"))
+
+    def test_deleted_name_is_not_reused_by_rename(self):
+        table = ProjectTable()
+        table.add("Old")
+        table.delete("Old")
+        table.add("X")
+        self.assertTrue(table.is_taken("Old", "X"))
+        with self.assertRaises(ValueError):
+            table.rename("X", "Old")
+        self.assertEqual(table.resolve(totals(Old=4, X=1)), {"X": {"pomodoros": 1}})
+
+    def test_deleted_project_is_revived_by_add(self):
+        table = ProjectTable()
+        project_id = table.add("Old")
+        table.delete("Old")
+        self.assertFalse(table.is_taken("Old"))
+        self.assertEqual(table.add("Old"), project_id)
+        self.assertEqual(table.resolve(totals(Old=4)), {"Old": {"pomodoros": 4}})
+
+    def test_upgrade_with_existing_projects(self):
+        # the prefs of an earlier version list the projects, the table starts empty
+        table = ProjectTable()
+        self.assertTrue(table.add_missing(["Work", "Thesis"]))
+        self.assertFalse(table.add_missing(["Work"]))
+        table.delete("Work")
+        table.rename("Thesis", "Paper")
+        self.assertEqual(table.resolve(totals(Work=2, Thesis=3)), {"Paper": {"pomodoros": 3}})
+
+    def test_delete_of_a_project_missing_from_the_table(self):
+        table = ProjectTable()
+        table.delete("Work")
+        self.assertEqual(table.resolve(totals(Work=2)), {})
+
+    def test_unrecorded_names_are_free(self):
+        table = ProjectTable()
+        table.add("A")
+        self.assertFalse(table.is_taken("B"))
+        self.assertFalse(table.is_taken("B", "A"))
+        self.assertFalse(table.is_taken("A"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+################################################################################
+# Title:    tests/test_stats_aggregator.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Differential test of StatsAggregator and load_aggregator against compute_stats,
+# on randomized histories. Runs headless, from the repository root:
+#
+#   python -m unittest discover -s tests -t .
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+from records import LocalDays, make_record, record_start
+from utilities import StatsAggregator, append_record, compute_stats, load_aggregator
+
+SEEDS = range(20)
+TYPES = ("pomodoro", "pomodoro", "break", "long")
+PROJECTS = ("", "Work", "Thesis", "Side")
+
+
+def random_history(rnd, today, count):
+    """Returns records sorted by start time around today, some in the formats of earlier versions"""
+    end = int(datetime.combine(today + timedelta(days=2), datetime.min.time()).timestamp())
+    start = end - rnd.randint(1, 60) * 86400
+    stamps = sorted(rnd.randint(start, end) for _ in range(count))
+    records = []
+    for ts in stamps:
+        record = make_record(rnd.choice(TYPES), ts, rnd.randint(1, 1800), rnd.choice(PROJECTS))
+        roll = rnd.random()
+        if roll < 0.1:
+            # written before records carried "ts"
+            del record["ts"]
+        elif roll < 0.12:
+            # no valid start, ignored everywhere
+            record["ts"] = None
+            record["start"] = "not a date"
+        records.append(record)
+    return records
+
+
+class StatsAggregatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.log_path = os.path.join(self.folder, "stats.jsonl")
+        self.rollup_path = os.path.join(self.folder, "stats.rollup.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_add_matches_compute_stats(self):
+        for seed in SEEDS:
+            rnd = random.Random(seed)
+            today = date.today() - timedelta(days=rnd.randint(0, 10))
+            records = random_history(rnd, today, rnd.randint(0, 400))
+            aggregator = StatsAggregator(today)
+            aggregator.load(records)
+            self.assertEqual(aggregator.results(today), compute_stats(records, today), seed)
+            # rolling over to later days and weeks
+            for later in (today + timedelta(days=1), today + timedelta(days=8)):
+                self.assertEqual(aggregator.results(later), compute_stats(records, later), seed)
+
+    def test_remove_matches_compute_stats(self):
+        for seed in SEEDS:
+            rnd = random.Random(seed)
+            today = date.today() - timedelta(days=rnd.randint(0, 10))
+            records = random_history(rnd, today, rnd.randint(1, 400))
+            aggregator = StatsAggregator(today)
+            aggregator.load(records)
+            removed = rnd.sample(records, rnd.randint(1, len(records)))
+            for record in removed:
+                aggregator.remove(record)
+            kept = [record for record in records if not any(record is other for other in removed)]
+            self.assertEqual(aggregator.results(today), compute_stats(kept, today), seed)
+            expected = StatsAggregator(today)
+            expected.load(kept)
+            self.assertEqual((aggregator.days, aggregator.day_index), (expected.days, expected.day_index), seed)
+
+    def test_between_matches_compute_stats(self):
+        local_days = LocalDays()
+        for seed in SEEDS:
+            rnd = random.Random(seed)
+            today = date.today()
+            records = random_history(rnd, today, rnd.randint(1, 400))
+            aggregator = StatsAggregator(today)
+            aggregator.load(records)
+            first = today - timedelta(days=rnd.randint(0, 60))
+            last = first + timedelta(days=rnd.randint(0, 30))
+            inside = [record for record in records
+                      if record_start(record) is not None and first <= local_days.day(record_start(record)) <= last]
+            expected = compute_stats(inside, today)["all_time"]
+            self.assertEqual(aggregator.between(first, last), expected, seed)
+            project = rnd.choice(PROJECTS)
+            expected = compute_stats([record for record in inside if record["project"] == project], today)["all_time"]
+            for key in ("pomodoros", "pomodoro_time", "breaks", "break_time"):
+                self.assertEqual(aggregator.between(first, last, project)[key], expected[key], seed)
+
+    def test_load_aggregator_matches_compute_stats(self):
+        for seed in SEEDS:
+            rnd = random.Random(seed)
+            today = date.today()
+            records = random_history(rnd, today, rnd.randint(0, 400))
+            for path in (self.log_path, self.rollup_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            split = rnd.randint(0, len(records))
+            with open(self.log_path, "w") as f:
+                for record in records[:split]:
+                    f.write(json.dumps(record) + "\n")
+            # cold: built from the whole log
+            cold = load_aggregator(self.log_path, self.rollup_path, today)
+            self.assertEqual(cold.results(today), compute_stats(records[:split], today), seed)
+            # warm: the saved index plus the tail appended since
+            for record in records[split:]:
+                append_record(self.log_path, record)
+            warm = load_aggregator(self.log_path, self.rollup_path, today)
+            self.assertEqual(warm.results(today), compute_stats(records, today), seed)
+            self.assertEqual(warm.day_index, sorted(warm.days), seed)
+
+
+if __name__ == "__main__":
+    unittest.main()
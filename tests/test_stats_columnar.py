@@ -0,0 +1,69 @@
+################################################################################
+# Title:    tests/test_stats_columnar.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+from datetime import datetime
+
+from records import make_record
+from stats_columnar import ColumnarStats
+
+
+class ColumnarStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.path = os.path.join(self.folder, "columns")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_extend_after_a_torn_append(self):
+        with ColumnarStats(self.path) as store:
+            store.extend([make_record("pomodoro", 1000, 1500, "Work"), make_record("break", 3000, 300)])
+        # a crash after the start and half of the duration column were written
+        with open(os.path.join(self.path, "start.bin"), "ab") as f:
+            array("q", [5000]).tofile(f)
+        with open(os.path.join(self.path, "duration.bin"), "ab") as f:
+            f.write(b"\x01\x02")
+        with ColumnarStats(self.path) as store:
+            self.assertEqual(len(store), 2)
+            store.extend([make_record("pomodoro", 9000, 1200, "Work")])
+            self.assertEqual([(record["ts"], record["duration"], record["project"]) for record in store.records()],
+                             [(1000, 1500, "Work"), (3000, 300, ""), (9000, 1200, "Work")])
+        with ColumnarStats(self.path) as store:
+            self.assertEqual(len(store), 3)
+
+    def test_extend_refuses_records_out_of_start_order(self):
+        with ColumnarStats(self.path) as store:
+            store.extend([make_record("pomodoro", 2000, 1500)])
+            with self.assertRaises(ValueError):
+                store.extend([make_record("pomodoro", 1000, 1500)])
+            with self.assertRaises(ValueError):
+                store.extend([make_record("pomodoro", 3000, 1500), make_record("break", 2500, 300)])
+            self.assertEqual(len(store), 1)
+
+    def test_range_rounds_up_to_whole_seconds(self):
+        with ColumnarStats(self.path) as store:
+            store.extend([make_record("pomodoro", ts, 60) for ts in (1000, 1001, 1002)])
+            start = datetime.fromtimestamp(1000.5)
+            end = datetime.fromtimestamp(1001.5)
+            self.assertEqual(store.range(start, end), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+################################################################################
+# Title:    tests/test_stats_sqlite.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+from benchmarks.synthetic import write_history
+from stats_sqlite import SQLiteStats, import_stats
+from utilities import compute_stats, read_stats
+
+
+class SQLiteStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="tomado-test-")
+        self.db_path = os.path.join(self.folder, "stats.sqlite3")
+        self.log_path = os.path.join(self.folder, "stats.jsonl")
+        write_history(self.log_path, 500, days=30)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_import_twice_adds_nothing(self):
+        with SQLiteStats(self.db_path) as store:
+            imported = import_stats(self.log_path, store)
+            self.assertEqual(import_stats(self.log_path, store), 0)
+            self.assertEqual(len(store), imported)
+            self.assertFalse(store.add(next(store.records())))
+            today = date.today()
+            self.assertEqual(store.compute_stats(today), compute_stats(read_stats(self.log_path), today))
+
+    def test_duplicates_of_an_earlier_database_are_removed(self):
+        # the schema before the unique index
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE intervals (id INTEGER PRIMARY KEY, start INTEGER NOT NULL, "
+                     "duration INTEGER NOT NULL, type INTEGER NOT NULL, project TEXT NOT NULL DEFAULT '')")
+        conn.execute("CREATE INDEX intervals_start ON intervals (start)")
+        conn.executemany("INSERT INTO intervals (start, duration, type, project) VALUES (?, ?, ?, ?)",
+                         [(1000, 1500, 0, "Work"), (1000, 1500, 0, "Work"), (1000, 300, 1, "Work")])
+        conn.commit()
+        conn.close()
+        with SQLiteStats(self.db_path) as store:
+            self.assertEqual([(record["ts"], record["type"]) for record in store.records()],
+                             [(1000, "pomodoro"), (1000, "break")])
+            self.assertEqual(import_stats(self.log_path, store), len(read_stats(self.log_path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
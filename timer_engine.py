@@ -0,0 +1,98 @@
+################################################################################
+# Title:    timer_engine.py
+# Project:  Tomado
+# Author:   Daniel Gális
+#           danielgalis.com
+#           danielgalis21@gmail.com
+#           GitHub: @mstcgalis
+#           Discord: @danielmstc#2967
+#           Are.na: are.na/daniel-galis
+#
+# License:  GPL v3
+# 2022
+################################################################################
+
+# Headless interval timer. Remaining and elapsed time are derived from a
+# monotonic deadline, never from counting callbacks, so a late, coalesced or
+# skipped tick (busy main thread, App Nap, sleep) cannot stretch an interval.
+
+import time
+
+
+def _pick_clock():
+    # the clock has to keep running while the machine sleeps, so an interval
+    # that ended during sleep is over on wake: CLOCK_BOOTTIME on Linux,
+    # CLOCK_MONOTONIC on macOS (time.monotonic stops during sleep there)
+    for name in ("CLOCK_BOOTTIME", "CLOCK_MONOTONIC"):
+        clock_id = getattr(time, name, None)
+        if clock_id is not None:
+            try:
+                time.clock_gettime(clock_id)
+            except OSError:
+                continue
+            return lambda: time.clock_gettime(clock_id)
+    return time.monotonic
+
+
+default_clock = _pick_clock()
+
+
+class IntervalClock(object):
+    """Tracks one interval: start, pause, continue and how much of it is left
+
+    Args:
+        clock (callable, optional): returns the current time in seconds, injectable for tests.
+            Defaults to a monotonic clock that keeps counting during sleep.
+    """
+    def __init__(self, clock=None):
+        self.clock = clock or default_clock
+        self.reset()
+
+    def reset(self):
+        """Unloads the interval"""
+        self.length = 0
+        # clock time at which the interval ends, None while not running
+        self.deadline = None
+        # remaining seconds while paused
+        self._remaining = 0
+
+    def start(self, length):
+        """Starts an interval of length seconds"""
+        self.length = length
+        self.deadline = self.clock() + length
+
+    def pause(self):
+        """Pauses the running interval, keeping its remaining time"""
+        if self.deadline is not None:
+            self._remaining = max(0.0, self.deadline - self.clock())
+            self.deadline = None
+
+    def resume(self):
+        """Continues a paused interval"""
+        if self.deadline is None and self.length:
+            self.deadline = self.clock() + self._remaining
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    @property
+    def started(self):
+        """True once an interval has been started, even if it is paused now"""
+        return bool(self.length)
+
+    def remaining(self):
+        """Seconds left in the interval (float, never negative)"""
+        if self.deadline is None:
+            return self._remaining if self.length else 0
+        return max(0.0, self.deadline - self.clock())
+
+    def elapsed(self):
+        """Seconds of the interval that have passed (float, at most the length)"""
+        if not self.length:
+            return 0
+        return self.length - self.remaining()
+
+    def finished(self):
+        """True if the interval has been started and no time is left"""
+        return self.started and self.remaining() <= 0
@@ -14,18 +14,56 @@
 
 __version__ = "0.3.2"
 
-import csv
 import json
 import os
+import sys
 import time
+from collections import deque
 from datetime import date, datetime
 
-import rumps
+# `python -m tomado stats|export|import|merge ...` runs headless, without loading AppKit
+if __name__ == "__main__" and len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+    from cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
+# for --profile-startup
+_IMPORTS_STARTED = time.perf_counter()
 
+import rumps
+from Foundation import NSDate
+from PyObjCTools.AppHelper import callAfter
+
+from audio import BUTTON_SOUND, SoundBank
+from display import MenuBarDisplay, format_remaining
+from io_worker import IOWorker
+from menu_model import MenuNode, MenuRenderer, new_counters, set_title
+from metrics import METRICS, timed
+from prefs_store import PrefsStore
+from records import ProjectTable, make_record, record_start
+from session import Session
+from startup_profile import StartupProfile
+from timer_engine import IntervalClock
 from utilities import *
 
+_IMPORTS_DONE = time.perf_counter()
+
+
+class ScheduledTimer(rumps.Timer):
+    """rumps.Timer whose next callback can be moved, so it only fires when the display changes
+    """
+    def schedule(self, delay):
+        """moves the next callback of the running timer to delay seconds from now
+
+        Args:
+            delay (float): seconds until the next callback
+        """
+        if self.is_alive():
+            self._nstimer.setFireDate_(NSDate.dateWithTimeIntervalSinceNow_(delay))
+
 class Tomado(object):
-    def __init__(self):
+    def __init__(self, profile=None):
+        # times the startup phases, see --profile-startup
+        self.profile = profile or StartupProfile()
         ## CONFIG
         # settings that cant't be user defined for now
         self.config = {
@@ -43,7 +81,9 @@ class Tomado(object):
             "pomodoro_length_options" : ["5", "10", "15", "20", "25", "30", "40", "45", "60"],
             "break_length_options" : ["3", "5", "10", "15", "20"],
             "long_length_options" : ["10", "15", "20", "25", "30"],
-            "sound_options" : ["Beep", "Birds", "Ding", "Cicadas", "Wood"]
+            "sound_options" : ["Beep", "Birds", "Ding", "Cicadas", "Wood"],
+            # intervals in the Recent submenu, and added by each Show Older
+            "recent_count" : 10
         }
        
         ## SESSION
@@ -58,8 +98,8 @@ class Tomado(object):
             "pomodoro",
             "long_break",
         ]
-        # dictionary representing the active session made from the session_general
-        self.session_current = {}
+        # the active session made from the session_general, with a cursor at the loaded interval
+        self.session = Session(self.session_general)
         
         ## APP
         # the quit button is changed to say Quit Tomado and the shortcut key is added
@@ -69,10 +109,19 @@ class Tomado(object):
 
         ## TIMER
         # variable containing the rumps.Timer class, arugments are its callback function (tick) and interval (1 sec)
-        self.timer = rumps.Timer(self.tick, 1)
+        # it only drives the display, the time itself is kept by self.clock, and tick moves
+        # each next callback to when the displayed time changes
+        self.timer = ScheduledTimer(self.tick, 1)
+        # monotonic deadline of the loaded interval
+        self.clock = IntervalClock()
         # creates application_support folder if there isnt one
         self.folder = rumps.application_support(self.config.get("app_name"))
         
+        ## IO
+        # background thread for stats appends and prefs writes, completions are reported on the main thread
+        self.io = IOWorker(dispatch=callAfter)
+        self.io.start()
+
         ## PREFERENCES
         # settings that can be user defined
         # default prefs
@@ -88,6 +137,7 @@ class Tomado(object):
             "sound_volume": 1,
             "timer_sound": "sounds/beep.mp3",
             "current_project": "",
+            "display_mode": "seconds",
             "projects": []
         }
         # path to the preferences file
@@ -100,23 +150,46 @@ class Tomado(object):
         # if it is empty (file didnt exist) use default prefs
         except FileNotFoundError:
             self.prefs = self.default_prefs    
-            save_file(self.prefs_path, self.prefs)
 
         # if the version doesnt match, use the saved preferences where possible
         if self.prefs.get("version") != self.config.get("version"):
             self.prefs = prefs_update(self.prefs, self.default_prefs)
-            save_file(self.prefs_path, self.prefs)
-        # setting up the playback object for notification sounds
-        self.notification_playback = load_sound(self.prefs.get("timer_sound"))
-        self.notification_playback.setVolume_(self.prefs.get("sound_volume"))
+        # writes prefs.json when the prefs change, skips the write if the file is already up to date
+        self.prefs_store = PrefsStore(self.prefs_path, self.prefs, worker=self.io, callback=self.io_done)
+        self.save_prefs()
+        self.profile.split("prefs")
+        # menu bar title and icon, redrawn only when they change
+        self.display = MenuBarDisplay(self.app, self.prefs.get("display_mode"))
+        # decoded sounds, loaded after the first paint of the menu bar or on first play
+        self.sounds = SoundBank()
         
         ## STATS
-        self.stats_path = str(self.folder + '/stats.json')
-        # initialise with empty list if missing or in the old dict format
-        if not read_stats(self.stats_path):
-            save_file(self.stats_path, [])
-        # ISO timestamp set when an interval starts, used as the record's start time
-        self.interval_start = ""
+        # append-only log, one JSON record per line
+        self.stats_path = str(self.folder + '/stats.jsonl')
+        # per-day totals of the log, saved on quit and caught up from the log tail on start
+        self.stats_rollup_path = str(self.folder + '/stats.rollup.json')
+        # interned project ids of every recorded project name, renames and deletes apply to the whole history
+        self.project_table = ProjectTable.load(str(self.folder + '/projects.json'))
+        # projects created before the table existed are only in the prefs
+        if self.project_table.add_missing(self.prefs.get("projects", [])):
+            self.project_table.save()
+        # running totals, loaded on the io worker by finish_startup and updated by save_interval
+        self.stats_aggregator = None
+        # records saved before the running totals were loaded
+        self.pending_records = []
+        # records the io worker could not append to the log, taken back out of the totals by
+        # _take_back_failed_records (a deque, appended on the io worker and emptied on the main thread)
+        self.failed_records = deque()
+        # the last intervals shown in the Recent submenu, newest first, and the log offset of the oldest one
+        # (None until they are read from the log)
+        self.recent_records = []
+        self.recent_offset = None
+        # intervals kept in the Recent submenu (a page per Show Older), and the ones dropped
+        # since recent_offset, which Show Older reads back first
+        self.recent_limit = self.config["recent_count"]
+        self.recent_trimmed = 0
+        # epoch second set when an interval starts, used as the record's start time
+        self.interval_start = 0
 
         ## PROJECT
         self.project_button = rumps.MenuItem("○ No Project")
@@ -128,6 +201,8 @@ class Tomado(object):
         self.end_session_button = rumps.MenuItem("End Session", callback=self.end_session, key="e")
         # about button
         self.about_button = rumps.MenuItem("About {}".format(self.config.get("app_name")), callback=self.about_info)
+        # writes the hot-path timings to metrics.json, only in the menu when they are recorded (--metrics)
+        self.dump_metrics_button = rumps.MenuItem("Dump Metrics", callback=self.dump_metrics)
         
         # preferences button
         self.preferences_button = rumps.MenuItem("Preferences")
@@ -151,6 +226,8 @@ class Tomado(object):
         self.autostart_session_button.type = "session"
         # sounds toggle
         self.allow_sounds_button = rumps.MenuItem("Allow Sounds", callback=self.sounds_toggle)
+        # minutes only display toggle
+        self.minutes_only_button = rumps.MenuItem("Show Minutes Only", callback=self.minutes_toggle)
         # sound volume
         self.sound_volume = rumps.MenuItem("Sound Volume")
         self.sound_volume_options = create_submenu(list(str(i)+"%" for i in range(10, 110, 10)), self.change_volume)
@@ -184,8 +261,15 @@ class Tomado(object):
         self.stats_all_time_breaks.icon = self.config.get("break_symbol")
         self.stats_all_time_project = rumps.MenuItem("○ No active project", callback=self.not_clickable_notification)
         self.stats_all_time_by_project = rumps.MenuItem("By Project")
+        # last 7 and 30 days, this month and year, rendered by load_stats
+        self.stats_windows_submenu = rumps.MenuItem("More Stats")
+        # the last intervals, newest first, rendered by _rebuild_recent_menu
+        self.recent_submenu = rumps.MenuItem("Recent")
         # export and clear
-        self.export_stats_button = rumps.MenuItem("Export Stats…", callback=self.export_stats)
+        self.export_stats_button = rumps.MenuItem("Export Stats")
+        self.export_options = create_submenu(["Intervals (CSV)", "Intervals (JSONL)", "Daily Summary (CSV)"], self.export_stats)
+        for option, fmt in zip(self.export_options, EXPORT_FORMATS):
+            option.format = fmt
         self.clear_stats_button = rumps.MenuItem("Clear Stats…", callback=self.clear_stats)
 
 
@@ -227,8 +311,11 @@ class Tomado(object):
                     self.stats_all_time_breaks,
                     self.stats_all_time_project,
                     [self.stats_all_time_by_project, []]]],
+                [self.stats_windows_submenu, []],
+                [self.recent_submenu, []],
                 None,
-                self.export_stats_button,
+                [self.export_stats_button,
+                    self.export_options],
                 self.clear_stats_button,
                 None,
                 [self.preferences_button, 
@@ -243,6 +330,8 @@ class Tomado(object):
                     self.autostart_break_button,
                     self.autostart_session_button,
                     None,
+                    self.minutes_only_button,
+                    None,
                     self.allow_sounds_button,
                     [self.sound_volume,
                         self.sound_volume_options],
@@ -254,10 +343,23 @@ class Tomado(object):
                 self.about_button,
                 self.quit_button]
             }
+        if METRICS.enabled:
+            self.menus["default_menu"].insert(-1, self.dump_metrics_button)
         
+        ## DYNAMIC MENUS
+        # rendered from MenuNode lists by diffing against the previous render
+        # counts the native menu mutations (created, removed, titles, ...) of every refresh
+        self.menu_mutations = new_counters()
+        self.project_menu = MenuRenderer(self.project_button, self._menu_item, self.menu_mutations)
+        self.stats_today_by_project_menu = MenuRenderer(self.stats_today_by_project, self._menu_item, self.menu_mutations)
+        self.stats_week_by_project_menu = MenuRenderer(self.stats_week_by_project, self._menu_item, self.menu_mutations)
+        self.stats_all_time_by_project_menu = MenuRenderer(self.stats_all_time_by_project, self._menu_item, self.menu_mutations)
+        self.stats_windows_menu = MenuRenderer(self.stats_windows_submenu, self._menu_item, self.menu_mutations)
+        self.recent_menu = MenuRenderer(self.recent_submenu, self._menu_item, self.menu_mutations)
+
         ## DEFAULT menu and state
         # create a session from the session_general
-        self.load_session()
+        self.session.reset()
         # set the menu to the default (first button is Start)
         self.app.menu.update(self.menus.get("default_menu"))
         # set the menu to the right interval types
@@ -268,6 +370,118 @@ class Tomado(object):
         self.startup_display_preferences()
         # build the project selector submenu
         self._rebuild_project_menu()
+        self.profile.split("menu build")
+        # the rest of the startup runs once the run loop is up, after the first paint of the menu bar
+        callAfter(self.finish_startup)
+
+    def finish_startup(self):
+        """loads the stats on the io worker and the notification sound, once the menu bar is shown
+        """
+        self.profile.mark("first paint")
+        self.io.submit(self._load_stats_aggregator, callback=self.stats_loaded)
+        self.io.submit(read_recent, self.stats_path, self.config["recent_count"], callback=self.recent_loaded)
+        with self.profile.phase("sound load"):
+            self.sounds.preload([self.prefs.get("timer_sound"), BUTTON_SOUND])
+
+    def _load_stats_aggregator(self):
+        """runs on the io worker, ahead of any stats append queued after it
+
+        Returns:
+            StatsAggregator: the running totals of the stats log
+        """
+        with self.profile.phase("stats load"):
+            # converts the stats.json of earlier versions on first run (creates an empty log otherwise)
+            migrate_stats(str(self.folder + '/stats.json'), self.stats_path)
+            return load_aggregator(self.stats_path, self.stats_rollup_path, date.today())
+
+    def stats_loaded(self, aggregator, error):
+        """called on the main thread with the loaded running totals, shows them in the menu
+
+        Args:
+            aggregator (StatsAggregator): the running totals
+            error (Exception): the exception the loading raised, None if it succeeded
+        """
+        if error is not None:
+            # the totals stay unloaded, so no rollup is saved over the unread log
+            self.io_done(None, error)
+            return
+        # the stats were cleared in the meantime
+        if self.stats_aggregator is not None:
+            return
+        for record in self.pending_records:
+            aggregator.add(record)
+        self.pending_records = []
+        self.stats_aggregator = aggregator
+        with self.profile.phase("stats menu"):
+            self.load_stats(sender="startup")
+        if self.profile.enabled:
+            print(self.profile.report())
+
+    def recent_loaded(self, result, error):
+        """called on the main thread with the last intervals of the log, shows them in the Recent submenu
+
+        Args:
+            result (tuple): (records newest first, log offset of the oldest one), see utilities.read_recent
+            error (Exception): the exception the reading raised, None if it succeeded
+        """
+        # not read, or the stats were cleared in the meantime
+        if error is not None or self.recent_offset is not None:
+            return
+        records, self.recent_offset = result
+        # intervals saved in the meantime are newer than the ones read
+        self.recent_records = self.recent_records + records
+        self._trim_recent()
+        self._rebuild_recent_menu()
+
+    def show_older_intervals(self, sender):
+        """adds the intervals before the oldest one shown to the Recent submenu, reading only them from the log
+
+        Args:
+            sender (MenuItem): the sender button
+        """
+        if self.recent_trimmed:
+            self.recent_offset = skip_records(self.stats_path, self.recent_offset, self.recent_trimmed)
+            self.recent_trimmed = 0
+        records, self.recent_offset = read_recent(self.stats_path, self.config["recent_count"], self.recent_offset)
+        self.recent_limit += self.config["recent_count"]
+        self.recent_records.extend(records)
+        self._rebuild_recent_menu()
+
+    def _trim_recent(self):
+        """drops the oldest intervals beyond the pages shown in the Recent submenu
+        """
+        extra = len(self.recent_records) - self.recent_limit
+        if extra > 0:
+            del self.recent_records[-extra:]
+            # they are in the log between recent_offset and the oldest one kept
+            if self.recent_offset is not None:
+                self.recent_trimmed += extra
+
+    def _rebuild_recent_menu(self):
+        nodes = []
+        keys = set()
+        for record in self.recent_records:
+            start = record_start(record)
+            if start is None:
+                continue
+            interval_type = record.get("type", "")
+            key = "interval:{}:{}".format(start, interval_type)
+            # intervals recorded twice (e.g. merged from another machine) still need their own item
+            while key in keys:
+                key += "+"
+            keys.add(key)
+            label = "{}   {}   {}".format(
+                datetime.fromtimestamp(start).strftime("%b %d  %H:%M"),
+                secs_to_time(record.get("duration", 0)),
+                record.get("project", ""),
+            ).rstrip()
+            nodes.append(MenuNode(key, label, callback=self.not_clickable_notification,
+                                  icon=self.config.get("{}_symbol".format(interval_type), self.config["break_symbol"])))
+        if not nodes:
+            nodes.append(MenuNode("no_data", "No data", callback=self.not_clickable_notification))
+        if self.recent_offset or self.recent_trimmed:
+            nodes.append(MenuNode("show_older", "Show Older…", callback=self.show_older_intervals))
+        self.recent_menu.render(nodes)
     
     ## STATES AND MENUS
     def load_timer(self, sender):
@@ -279,7 +493,7 @@ class Tomado(object):
         #stop the current timer
         self.timer.stop()
         #reset the current timer
-        self.timer.count = 0
+        self.clock.reset()
 
         autostart = False
         interval_type = self.get_current_interval_type()
@@ -299,8 +513,10 @@ class Tomado(object):
             self.end_session(sender="loaded_state")
 
         # change the title to the current interval
-        self.app.title = secs_to_time(self.prefs.get("{}_length".format(self.get_current_interval_type())))
-        self.app.icon = self.config.get("{}_symbol".format(self.get_current_interval_type())) 
+        self.display.render(
+            title=format_remaining(self.prefs.get("{}_length".format(self.get_current_interval_type())), self.display.mode),
+            icon=self.config.get("{}_symbol".format(self.get_current_interval_type())),
+        )
 
         if autostart and sender != "startup":
             first_button = self.pause_button
@@ -350,80 +566,49 @@ class Tomado(object):
         current_interval = self.get_current_interval_type().capitalize()
         if current_interval == "Long":
             current_interval = "Long Break"
-        self.start_button.title = "Start {}".format(current_interval)
-        self.pause_button.title = "Pause {}".format(current_interval)
-        self.continue_button.title = "Continue {}".format(current_interval)
-        self.skip_button.title = "Skip {}".format(current_interval)
-        self.reset_button.title = "Reset {}".format(current_interval)
+        # only titles that changed are set
+        set_title(self.start_button, "Start {}".format(current_interval), self.menu_mutations)
+        set_title(self.pause_button, "Pause {}".format(current_interval), self.menu_mutations)
+        set_title(self.continue_button, "Continue {}".format(current_interval), self.menu_mutations)
+        set_title(self.skip_button, "Skip {}".format(current_interval), self.menu_mutations)
+        set_title(self.reset_button, "Reset {}".format(current_interval), self.menu_mutations)
+
+    def _menu_item(self, node):
+        """creates the native item of a menu_model.MenuNode
+
+        Args:
+            node (MenuNode): the model of the item
+
+        Returns:
+            rumps.MenuItem: the new item
+        """
+        return rumps.MenuItem(node.title, callback=node.callback)
 
     ## SESSION
-    # returns the current interval TYPE from current_session dict
     def get_current_interval_type(self, full_text=False):
-        """returns the currently loaded interval type (pomodoro, break, long) of the current_session
+        """returns the currently loaded interval type (pomodoro, break, long) of the session
 
         Args:
             full_text (bool, optional): If true, a string meant for the user will be returned. Defaults to False.
 
         Returns:
-            string: type of loaded
-             interval 
-        """
-        # loop through the session, getting the interval key and the bool value
-        for interval, value in self.session_current.items():
-            # if the bool is False aka the interval has not been completed
-            if isinstance(value, bool):
-                # return the first word of interval key (pomodoro/break/long)
-                if full_text is True:
-                    if interval.split("_")[0] == "long":
-                        return "Long Break"
-                    else:
-                        return interval.split("_")[0].capitalize()
-                else:
-                    return interval.split("_")[0]
-        # when the loop concludes without returning the function, it means there is no interval left in the session - return False
-        return False
-
-    def get_current_interval(self):
-        """returns currently loaded specific (indexed) interval of current_session
+            string: type of loaded interval, False if there is no interval left in the session
+        """
+        if full_text is True:
+            return self.session.current_type_text
+        return self.session.current_type
 
-        Returns:
-            string: indexed interval (type_i)
-        """
-        # loop through the session, getting the interval key and the bool value
-        for interval, value in self.session_current.items():
-            # if the bool is False aka the interval has not been completed
-            if isinstance(value, bool):
-                # return the first word of interval key (pomodoro/break/long)
-                return interval
-    
     def update_session_info(self):
         """updates the session_info with correct symbols
         """
-        string = ""
-        # loop through the items in session
-        for interval, value in self.session_current.items():
-            # if the item starts with "pomodoro"
-            if interval.split("_")[0] == "pomodoro":
-                # if the interval is the current interval and there is time in the timer
-                if interval == self.get_current_interval() and self.timer.is_alive() is True:
-                    # add the half-full clock
-                    string += self.config.get("clock_half")
-                # if the interval has a value type bool, aka it has not been started yet
-                elif type(value) == bool:
-                    # add the empty clock
-                    string += self.config.get("clock_empty")
-                # else the value has alredy been assigned an int aka it has passed already
-                else:
-                    # add the full clock
-                    string += self.config.get("clock_full")
+        string = self.session.clock(
+            self.timer.is_alive(),
+            self.config.get("clock_full"),
+            self.config.get("clock_half"),
+            self.config.get("clock_empty"),
+        )
         # set the title of the session info to the string
-        self.session_info.title = "Session: {}".format(string)
-
-    def load_session(self):
-        """loads a new session from self.session_general
-        """
-        for c, interval in enumerate(self.session_general):
-            self.session_current["{}_{}".format(interval, c)] = False
+        set_title(self.session_info, "Session: {}".format(string), self.menu_mutations)
 
     def end_session(self, sender):
         """ends the current session, saving the current interval and loading the new session
@@ -432,16 +617,15 @@ class Tomado(object):
             sender (string, MenuItem): information on the sender
         """
         if isinstance(sender, rumps.MenuItem):
-            button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+            self.button_sound()
         # stop the timer
         self.timer.stop()
         # if the sender is not the loaded_state function
         if sender != "loaded_state":
             # save interval
-            self.save_interval(self.get_current_interval_type(), self.timer.count - 1)
+            self.save_interval(self.get_current_interval_type(), int(self.clock.elapsed()))
 
-        self.session_current.clear()
-        self.load_session()
+        self.session.reset()
 
         # load the next interval
         if sender != "loaded_state":
@@ -455,36 +639,27 @@ class Tomado(object):
         self.project_button.title = "● {}".format(current) if current else "○ No Project"
 
     def _rebuild_project_menu(self):
-        for key in list(self.project_button.keys()):
-            self.project_button.pop(key)
         current = self.prefs.get("current_project", "")
-        no_proj = rumps.MenuItem("No Project", callback=self.no_project)
-        no_proj.state = int(not current)
-        items = [no_proj]
+        nodes = [MenuNode("no_project", "No Project", state=int(not current), callback=self.no_project)]
         for name in self.prefs.get("projects", []):
-            proj_item = rumps.MenuItem(name)
-            proj_item.state = int(name == current)
-            sel = rumps.MenuItem("Select", callback=self.select_project)
-            sel.project_name = name
-            ren = rumps.MenuItem("Rename…", callback=self.rename_project)
-            ren.project_name = name
-            dlt = rumps.MenuItem("Delete", callback=self.delete_project)
-            dlt.project_name = name
-            proj_item.update([sel, ren, dlt])
-            items.append(proj_item)
-        items.append(rumps.MenuItem("+ New Project…", callback=self.new_project))
-        self.project_button.update(items)
+            nodes.append(MenuNode("project:" + name, name, state=int(name == current), children=[
+                MenuNode("select", "Select", callback=self.select_project, project_name=name),
+                MenuNode("rename", "Rename…", callback=self.rename_project, project_name=name),
+                MenuNode("delete", "Delete", callback=self.delete_project, project_name=name),
+            ]))
+        nodes.append(MenuNode("new_project", "+ New Project…", callback=self.new_project))
+        self.project_menu.render(nodes)
         self._update_project_label()
 
     def select_project(self, sender):
         self.prefs["current_project"] = sender.project_name
-        save_file(self.prefs_path, self.prefs)
+        self.save_prefs()
         self._rebuild_project_menu()
         self.load_stats(sender="")
 
     def no_project(self, sender):
         self.prefs["current_project"] = ""
-        save_file(self.prefs_path, self.prefs)
+        self.save_prefs()
         self._rebuild_project_menu()
         self.load_stats(sender="")
 
@@ -494,11 +669,14 @@ class Tomado(object):
         if not response.clicked:
             return
         name = response.text.strip()
-        if not name or name in self.prefs.get("projects", []):
+        # a name recorded for another (renamed) project would take over its history
+        if not name or name in self.prefs.get("projects", []) or self.project_table.is_taken(name):
             return
         self.prefs.setdefault("projects", []).append(name)
         self.prefs["current_project"] = name
-        save_file(self.prefs_path, self.prefs)
+        self.project_table.add(name)
+        self.project_table.save()
+        self.save_prefs()
         self._rebuild_project_menu()
         self.load_stats(sender="")
 
@@ -511,11 +689,17 @@ class Tomado(object):
         new_name = response.text.strip()
         if not new_name or new_name == old_name or new_name in self.prefs.get("projects", []):
             return
+        # as in new_project, also a name that still holds the intervals of a deleted project
+        if self.project_table.is_taken(new_name, old_name):
+            return
         projects = self.prefs.get("projects", [])
         projects[projects.index(old_name)] = new_name
         if self.prefs.get("current_project") == old_name:
             self.prefs["current_project"] = new_name
-        save_file(self.prefs_path, self.prefs)
+        # the recorded intervals of the project follow the new name
+        self.project_table.rename(old_name, new_name)
+        self.project_table.save()
+        self.save_prefs()
         self._rebuild_project_menu()
         self.load_stats(sender="")
 
@@ -526,11 +710,15 @@ class Tomado(object):
             projects.remove(name)
         if self.prefs.get("current_project") == name:
             self.prefs["current_project"] = ""
-        save_file(self.prefs_path, self.prefs)
+        # the recorded intervals of the project now count as having no project
+        self.project_table.delete(name)
+        self.project_table.save()
+        self.save_prefs()
         self._rebuild_project_menu()
         self.load_stats(sender="")
 
     ## STATS
+    @timed("save_interval")
     def save_interval(self, save_interval, save_length):
         """saves a just ended interval to the stats file, if it has a length of at least 1
 
@@ -543,86 +731,168 @@ class Tomado(object):
         """
         if not save_length or save_length <= 0:
             return False
-        append_interval(
-            self.stats_path,
-            save_interval,
-            self.interval_start or datetime.now().isoformat(timespec='seconds'),
-            save_length,
-            self.prefs.get("current_project", ""),
-        )
+        record = make_record(save_interval, self.interval_start or int(time.time()), save_length,
+                             self.prefs.get("current_project", ""))
+        # the totals include the record right away, the write happens on the io worker
+        if self.stats_aggregator is not None:
+            self.stats_aggregator.add(record)
+        else:
+            self.pending_records.append(record)
+        self.io.submit(self._append_interval, record, callback=self.interval_written)
+        self.recent_records.insert(0, record)
+        self._trim_recent()
+        self._rebuild_recent_menu()
         return True
 
+    def _append_interval(self, record):
+        """appends a record to the stats log, runs on the io worker
+
+        Args:
+            record (dict): the interval record
+        """
+        try:
+            return append_record(self.stats_path, record)
+        except Exception:
+            self.failed_records.append(record)
+            raise
+
+    def interval_written(self, result, error):
+        """called on the main thread when an append of save_interval is done, a failed one is taken back out of the stats
+
+        Args:
+            result: return value of the append
+            error (Exception): the exception the append raised, None if it succeeded
+        """
+        if self._take_back_failed_records():
+            self._rebuild_recent_menu()
+            self.load_stats(sender="")
+        self.io_done(result, error)
+
+    def _take_back_failed_records(self):
+        """removes the records the io worker could not append from the running totals and the Recent submenu,
+        so the totals and the rollup index only count what is in the log
+
+        Returns:
+            bool: True if any record was taken back
+        """
+        taken = False
+        while self.failed_records:
+            record = self.failed_records.popleft()
+            taken = True
+            if record in self.pending_records:
+                self.pending_records.remove(record)
+            elif self.stats_aggregator is not None:
+                self.stats_aggregator.remove(record)
+            if record in self.recent_records:
+                self.recent_records.remove(record)
+        return taken
+
+    def save_stats_rollup(self):
+        """waits for the queued stats appends and saves the rollup index, which then covers the whole log
+        """
+        self.io.flush()
+        # before the callbacks of the appends run, e.g. when quitting
+        self._take_back_failed_records()
+        if self.stats_aggregator is None:
+            return
+        self.stats_aggregator.offset = os.path.getsize(self.stats_path)
+        save_rollup(self.stats_rollup_path, self.stats_aggregator)
+
+    @timed("load_stats")
     def load_stats(self, sender):
-        """loads stats from stats file and displays them in the menu (daily and weekly)
+        """displays the running stats totals in the menu (daily, weekly and all time)
 
         Args:
             sender (string, MenuItem): information on the sender
         """
-        stats = read_stats(self.stats_path)
-        s = compute_stats(stats, date.today())
+        # shown by stats_loaded once the totals are loaded
+        if self.stats_aggregator is None:
+            return
+        s = self.stats_aggregator.results(date.today())
+        # show renamed projects under their new name and leave deleted ones out
+        for period in s.values():
+            period["by_project"] = self.project_table.resolve(period["by_project"])
 
-        self.stats_today_pomodoros.title = "{}   {}".format(s["today"]["pomodoros"], secs_to_time(s["today"]["pomodoro_time"], hours=True))
-        self.stats_today_breaks.title = "{}   {}".format(s["today"]["breaks"], secs_to_time(s["today"]["break_time"], hours=True))
-        self.stats_week_pomodoros.title = "{}   {}".format(s["week"]["pomodoros"], secs_to_time(s["week"]["pomodoro_time"], hours=True))
-        self.stats_week_breaks.title = "{}   {}".format(s["week"]["breaks"], secs_to_time(s["week"]["break_time"], hours=True))
+        m = self.menu_mutations
+        set_title(self.stats_today_pomodoros, "{}   {}".format(s["today"]["pomodoros"], secs_to_time(s["today"]["pomodoro_time"], hours=True)), m)
+        set_title(self.stats_today_breaks, "{}   {}".format(s["today"]["breaks"], secs_to_time(s["today"]["break_time"], hours=True)), m)
+        set_title(self.stats_week_pomodoros, "{}   {}".format(s["week"]["pomodoros"], secs_to_time(s["week"]["pomodoro_time"], hours=True)), m)
+        set_title(self.stats_week_breaks, "{}   {}".format(s["week"]["breaks"], secs_to_time(s["week"]["break_time"], hours=True)), m)
 
-        self.stats_all_time_pomodoros.title = "{}   {}".format(s["all_time"]["pomodoros"], secs_to_time(s["all_time"]["pomodoro_time"], hours=True))
-        self.stats_all_time_breaks.title = "{}   {}".format(s["all_time"]["breaks"], secs_to_time(s["all_time"]["break_time"], hours=True))
+        set_title(self.stats_all_time_pomodoros, "{}   {}".format(s["all_time"]["pomodoros"], secs_to_time(s["all_time"]["pomodoro_time"], hours=True)), m)
+        set_title(self.stats_all_time_breaks, "{}   {}".format(s["all_time"]["breaks"], secs_to_time(s["all_time"]["break_time"], hours=True)), m)
 
         current = self.prefs.get("current_project", "")
         self._update_stats_project_line(self.stats_today_project, s["today"], current)
         self._update_stats_project_line(self.stats_week_project, s["week"], current)
         self._update_stats_project_line(self.stats_all_time_project, s["all_time"], current)
-        self._rebuild_by_project_submenu(self.stats_today_by_project, s["today"]["by_project"])
-        self._rebuild_by_project_submenu(self.stats_week_by_project, s["week"]["by_project"])
-        self._rebuild_by_project_submenu(self.stats_all_time_by_project, s["all_time"]["by_project"])
+        self._rebuild_by_project_submenu(self.stats_today_by_project_menu, s["today"]["by_project"])
+        self._rebuild_by_project_submenu(self.stats_week_by_project_menu, s["week"]["by_project"])
+        self._rebuild_by_project_submenu(self.stats_all_time_by_project_menu, s["all_time"]["by_project"])
+        self._rebuild_stats_windows_submenu(date.today())
+
+    @timed("rebuild_stats_windows")
+    def _rebuild_stats_windows_submenu(self, today):
+        """renders the totals of the periods of utilities.stats_windows, looked up by day in the stats aggregator
+
+        Args:
+            today (datetime.date): the reference date
+        """
+        nodes = []
+        for title, first_day, last_day in stats_windows(today):
+            period = self.stats_aggregator.between(first_day, last_day)
+            by_project = self.project_table.resolve(period["by_project"])
+            children = [
+                MenuNode("pomodoros", "{}   {}".format(period["pomodoros"], secs_to_time(period["pomodoro_time"], hours=True)),
+                         callback=self.not_clickable_notification, icon=self.config.get("pomodoro_symbol")),
+                MenuNode("breaks", "{}   {}".format(period["breaks"], secs_to_time(period["break_time"], hours=True)),
+                         callback=self.not_clickable_notification, icon=self.config.get("break_symbol")),
+            ]
+            for project, data in by_project.items():
+                label = "{}  🍅 {}   {}".format(project, data["pomodoros"], secs_to_time(data["pomodoro_time"], hours=True))
+                children.append(MenuNode("project:" + project, label, callback=self.not_clickable_notification))
+            nodes.append(MenuNode(title, title, children=children))
+        self.stats_windows_menu.render(nodes)
 
     def _update_stats_project_line(self, item, period_stats, current_project):
         if current_project:
             pd = period_stats["by_project"].get(current_project, {})
             pomodoros = pd.get("pomodoros", 0)
             ptime = pd.get("pomodoro_time", 0)
-            item.title = "● {}: {} 🍅  {}".format(current_project, pomodoros, secs_to_time(ptime, hours=True))
+            set_title(item, "● {}: {} 🍅  {}".format(current_project, pomodoros, secs_to_time(ptime, hours=True)), self.menu_mutations)
         else:
-            item.title = "○ No active project"
+            set_title(item, "○ No active project", self.menu_mutations)
 
-    def _rebuild_by_project_submenu(self, submenu_item, by_project_data):
-        for key in list(submenu_item.keys()):
-            submenu_item.pop(key)
+    @timed("rebuild_by_project")
+    def _rebuild_by_project_submenu(self, renderer, by_project_data):
         if not by_project_data:
-            submenu_item.update([rumps.MenuItem("No data", callback=self.not_clickable_notification)])
+            renderer.render([MenuNode("no_data", "No data", callback=self.not_clickable_notification)])
             return
         max_len = max(len(p) for p in by_project_data)
-        items = []
+        nodes = []
         for project, data in by_project_data.items():
             label = "{:<{}}  🍅 {:>2}   {}".format(project, max_len, data["pomodoros"], secs_to_time(data["pomodoro_time"], hours=True))
-            items.append(rumps.MenuItem(label, callback=self.not_clickable_notification))
-        submenu_item.update(items)
+            nodes.append(MenuNode("project:" + project, label, callback=self.not_clickable_notification))
+        renderer.render(nodes)
 
+    @timed("export_stats")
     def export_stats(self, sender):
-        stats = read_stats(self.stats_path)
-        if not stats:
-            rumps.alert("No Stats", "Nothing to export yet.")
-            return
-        filename = "tomado-stats-{}.csv".format(date.today().isoformat())
+        """streams the stats log into a file on the Desktop, in the format of the sender button
+
+        Args:
+            sender (MenuItem): one of the export buttons, with a format attribute (see utilities.EXPORT_FORMATS)
+        """
+        extension = "jsonl" if sender.format == "jsonl" else "csv"
+        suffix = "-daily" if sender.format == "daily" else ""
+        filename = "tomado-stats-{}{}.{}".format(date.today().isoformat(), suffix, extension)
         export_path = os.path.join(os.path.expanduser("~"), "Desktop", filename)
         with open(export_path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["date", "time", "type", "duration_seconds", "duration_minutes", "project"])
-            for record in stats:
-                try:
-                    dt = datetime.fromisoformat(record["start"])
-                except (KeyError, ValueError):
-                    continue
-                duration = record.get("duration", 0)
-                writer.writerow([
-                    dt.date().isoformat(),
-                    dt.strftime("%H:%M:%S"),
-                    record.get("type", ""),
-                    duration,
-                    round(duration / 60, 2),
-                    record.get("project", ""),
-                ])
+            # renamed and deleted projects as in the menu
+            count = export_records(self.project_table.resolve_records(iter_stats(self.stats_path)), f, sender.format)
+        if not count:
+            os.remove(export_path)
+            rumps.alert("No Stats", "Nothing to export yet.")
+            return
         rumps.alert("Exported", "Saved to Desktop/{}".format(filename))
 
     def clear_stats(self, sender):
@@ -633,10 +903,40 @@ class Tomado(object):
             cancel="Cancel",
         )
         if response == 1:
-            save_file(self.stats_path, [])
+            # truncate the log, after any queued appends
+            self.io.flush()
+            self.failed_records.clear()
+            open(self.stats_path, "w").close()
+            self.stats_aggregator = StatsAggregator(date.today())
+            self.pending_records = []
+            self.recent_records = []
+            self.recent_offset = 0
+            self.recent_limit = self.config["recent_count"]
+            self.recent_trimmed = 0
+            self._rebuild_recent_menu()
+            self.save_stats_rollup()
             self.load_stats(sender="")
 
     ## PREFERENCES
+    def save_prefs(self):
+        """marks the preferences as changed, changes made within a second of each other are saved in one write
+        """
+        self.prefs_store.changed()
+
+    def io_done(self, result, error):
+        """called on the main thread when a write of the io worker is done, notifies the user if it failed
+
+        Args:
+            result: return value of the write
+            error (Exception): the exception the write raised, None if it succeeded
+        """
+        if error is not None:
+            rumps.notification(
+                    title=self.config["app_name"],
+                    subtitle="Could not save",
+                    message=str(error),
+                    sound=False)
+
     def startup_display_preferences(self):
         """displays correct preferences (from prefs file) on start up
         """
@@ -653,6 +953,8 @@ class Tomado(object):
                 if int(option.title.split()[0]) * 60 == self.prefs.get("{}_length".format(option.type)):
                     # make the button active
                     option.state = 1
+        # MINUTES ONLY TOGGLE
+        self.minutes_only_button.state = int(self.prefs.get("display_mode") == "minutes")
         # SOUND TOGGLE
         self.allow_sounds_button.state = int(bool(self.prefs.get("allow_sound")))
         # SOUND VOLUME
@@ -680,7 +982,7 @@ class Tomado(object):
             sender.state = 1
         else:
             sender.state = 0
-        save_file(self.prefs_path, self.prefs)
+        self.save_prefs()
 
     def change_length(self, sender):
         """changes the length of an interval (Pomodoro, Break, Long Break) and saves it to the preferences file
@@ -704,11 +1006,28 @@ class Tomado(object):
         sender.state = 1
 
         # if there isnt an active interval
-        if self.timer.count == 0:
+        if not self.clock.started:
             #set the menu bar timer text to the new length
-            self.app.title = secs_to_time(self.prefs.get("{}_length".format(self.get_current_interval_type())))
+            self.display.render(title=format_remaining(self.prefs.get("{}_length".format(self.get_current_interval_type())), self.display.mode))
+
+        self.save_prefs()
 
-        save_file(self.prefs_path, self.prefs)
+    def minutes_toggle(self, sender):
+        """toggles the menu bar timer between MM:SS and whole minutes, which wakes the app up only once a minute
+
+        Args:
+            sender (MenuItem): the sender button
+        """
+        self.prefs["display_mode"] = "seconds" if self.prefs.get("display_mode") == "minutes" else "minutes"
+        self.display.mode = self.prefs["display_mode"]
+        sender.state = int(self.display.mode == "minutes")
+        if self.clock.started:
+            # redraw now and move the next tick to the next change in the new mode
+            delay = self.display.show_remaining(self.clock.remaining())
+            self.timer.schedule(delay)
+        else:
+            self.display.render(title=format_remaining(self.prefs.get("{}_length".format(self.get_current_interval_type())), self.display.mode))
+        self.save_prefs()
 
     ## SOUNDS
     def sounds_toggle(self, sender):
@@ -724,7 +1043,7 @@ class Tomado(object):
             sender.state = 1
         else:
             sender.state = 0
-        save_file(self.prefs_path, self.prefs)
+        self.save_prefs()
 
     def change_volume(self, sender):
         """changes the sound volume in prefs and updates the menu
@@ -739,8 +1058,7 @@ class Tomado(object):
                 option.state = 0
                 break
         sender.state = 1
-        save_file(self.prefs_path, self.prefs)
-        self.notification_playback.setVolume_(self.prefs.get("sound_volume"))
+        self.save_prefs()
 
     def change_sound(self, sender):
         """changes the sound that notifies the user at the end of the interval in prefs
@@ -755,10 +1073,15 @@ class Tomado(object):
                 sound.state = 0
                 break
         sender.state = 1
-        save_file(self.prefs_path, self.prefs)
-        del self.notification_playback
-        self.notification_playback = load_sound(self.prefs.get("timer_sound"))
-        self.notification_playback.setVolume_(self.prefs.get("sound_volume"))
+        self.save_prefs()
+        # decoded ahead of the end of the interval
+        self.sounds.preload([self.prefs.get("timer_sound")])
+
+    def button_sound(self):
+        """plays the button-pressed feedback sound, if sounds are allowed
+        """
+        if self.prefs.get("allow_sound"):
+            self.sounds.play(BUTTON_SOUND, self.prefs.get("sound_volume"))
     
     ## NOTIFICATIONS
     def interval_notification(self, type):
@@ -773,7 +1096,7 @@ class Tomado(object):
                 message=self.config["{}_message".format(type)],
                 sound=False)
         if self.prefs.get("allow_sound"):
-            self.notification_playback.play()
+            self.sounds.play(self.prefs.get("timer_sound"), self.prefs.get("sound_volume"))
 
     def not_clickable_notification(self, sender=None):
         """notidies the user when a non clickable MenuItem is pressed
@@ -785,23 +1108,24 @@ class Tomado(object):
                 sound=False)
 
     ## TIMER
+    @timed("tick")
     def tick(self, sender):
-        """triggeres every second, moves the timer
+        """triggered whenever the displayed time changes (every second, or every minute in minutes only mode), moves the timer
 
         Args:
-            sender (string, MenuItem): information on the sender
+            sender (ScheduledTimer): the timer
         """
-        # add one to the counter
-        sender.count += 1
-        # calculate the remaining time from the counter and the end
-        time_left = sender.end - sender.count
-        # the menu bar title gets changed to the remaining time coverted by a function
-        self.app.title = secs_to_time(time_left+1)
-        self.app.icon = self.config.get("{}_symbol".format(self.get_current_interval_type()))
+        # the remaining time comes from the clock, so late or missed ticks don't stretch the interval
+        time_left = self.clock.remaining()
+        # the menu bar title gets changed to the remaining time, only redrawn if it changed
+        delay = self.display.show_remaining(time_left, self.config.get("{}_symbol".format(self.get_current_interval_type())))
         # if there is no remaining time
-        if time_left < 0:
+        if self.clock.finished():
             # stop the timer
             self.stop_timer()
+        else:
+            # sleep until the displayed time changes
+            sender.schedule(delay)
 
     def start_timer(self, sender):
         """starts the interval
@@ -811,29 +1135,29 @@ class Tomado(object):
         """
         # check if the function is being triggered by a button
         if isinstance(sender, rumps.MenuItem):
-            button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+            self.button_sound()
             # replace the start button to the pause button
             self.swap_menu_item(self.start_button, self.pause_button)
-        # define the timer length from preferences
-        self.timer.end = self.prefs.get("{}_length".format(self.get_current_interval_type()))
+        # start the clock with the timer length from preferences
+        self.clock.start(self.prefs.get("{}_length".format(self.get_current_interval_type())))
         # start the timer
         self.timer.start()
         self.update_session_info()
 
-        self.interval_start = datetime.now().isoformat(timespec='seconds')
+        self.interval_start = int(time.time())
     
     def stop_timer(self):
         """stops the loaded interval
         """
         # stop the timer
         self.timer.stop()
-        self.timer.end = 0
+        elapsed = int(self.clock.elapsed())
         # notify the user according to the current timer type
         self.interval_notification(self.get_current_interval_type())
         # save interval
-        self.save_interval(self.get_current_interval_type(), self.timer.count - 1)
+        self.save_interval(self.get_current_interval_type(), elapsed)
         # set the just passed interval to the time it has elapsed
-        self.session_current[self.get_current_interval()] = self.timer.count - 1
+        self.session.finish(elapsed)
         # load the next interval
         self.load_timer("stop_timer")
 
@@ -843,9 +1167,10 @@ class Tomado(object):
         Args:
             sender (string, MenuItem): information on the sender
         """
-        button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+        self.button_sound()
         # stop the timer
         self.timer.stop()
+        self.clock.pause()
         # swap the pause_button for the continue button
         self.swap_menu_item(self.pause_button, self.continue_button)
 
@@ -855,8 +1180,9 @@ class Tomado(object):
         Args:
             sender (string, MenuItem): information on the sender
         """
-        button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+        self.button_sound()
         # starts the timer
+        self.clock.resume()
         self.timer.start()
         # replaces the continue button with the pause button
         self.swap_menu_item(self.continue_button, self.pause_button)
@@ -867,7 +1193,7 @@ class Tomado(object):
         Args:
             sender (string, MenuItem): information on the sender
         """
-        button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+        self.button_sound()
         # load the next interval
         self.load_timer("reset_timer")
 
@@ -877,18 +1203,27 @@ class Tomado(object):
         Args:
             sender (string, MenuItem): information on the sender
         """
-        button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+        self.button_sound()
+        elapsed = int(self.clock.elapsed())
         # save interval
-        self.save_interval(self.get_current_interval_type(), self.timer.count - 1)
-        # if the timer has not started yet
-        if self.timer.count == 0:
-            self.session_current[self.get_current_interval()] = 0
-        else:
-            # set the just passed interval to the time it has elapsed
-            self.session_current[self.get_current_interval()] = self.timer.count - 1
+        self.save_interval(self.get_current_interval_type(), elapsed)
+        # set the just passed interval to the time it has elapsed (0 if the timer has not started yet)
+        self.session.finish(elapsed)
         # load the next interval
         self.load_timer("skip_timer")
     
+    def dump_metrics(self, sender):
+        """writes the recorded hot-path timings to metrics.json in the application support folder
+
+        Args:
+            sender (string, MenuItem): information on the sender
+        """
+        path = os.path.join(self.folder, "metrics.json")
+        METRICS.dump(path)
+        lines = ["{}: {} calls, p50 {:.2f} ms, max {:.2f} ms".format(name, stats["count"], stats["p50_ms"], stats["max_ms"])
+                 for name, stats in METRICS.snapshot()["operations"].items()]
+        rumps.alert("Metrics", "Saved to {}\n\n{}".format(path, "\n".join(lines)))
+
     def about_info(self, sender):
         """shows info about the app
 
@@ -912,11 +1247,18 @@ class Tomado(object):
         Args:
             sender (_type_): _description_
         """
-        button_sound(self.prefs.get("allow_sound"), self.prefs.get("sound_volume"))
+        self.button_sound()
         self.end_session(sender="")
+        self.save_stats_rollup()
+        self.prefs_store.flush()
+        # run the remaining writes
+        self.io.stop()
         rumps.quit_application(sender=None)
 
 ## RUN
 if __name__ == "__main__":
-    app = Tomado()
+    # --metrics is read by the metrics module, before the @timed methods are decorated
+    profile = StartupProfile(enabled="--profile-startup" in sys.argv[1:], started=_IMPORTS_STARTED)
+    profile.add("imports", _IMPORTS_DONE - _IMPORTS_STARTED)
+    app = Tomado(profile=profile)
     app.run()
\ No newline at end of file
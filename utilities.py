@@ -12,16 +12,17 @@
 # 2022
 ################################################################################
 
+import bisect
+import csv
 import json
+import math
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-import rumps
-from AppKit import NSSound
+from records import LocalDays, local_midnight, make_record, record_start
 
-
-def load_sound(path):
-    return NSSound.alloc().initWithContentsOfFile_byReference_(os.path.abspath(path), True)
+# rumps is imported where it is used, so the stats functions can run headless
+# (benchmarks, Linux); sounds are played through audio.py
 
 
 def secs_to_time(seconds, hours=False):
@@ -43,19 +44,6 @@ def secs_to_time(seconds, hours=False):
         return '{:02d}:{:02d}'.format(mins, secs)
 
 
-_button_sound = load_sound('sounds/button.mp3')
-
-def button_sound(allow_sound, sound_volume):
-    """Plays a button-pressed feedback sound
-
-    Args:
-        allow_sound (bool): if true, plays the feedback sound
-        sound_volume (float): the volume 0.1-1
-    """
-    if allow_sound:
-        _button_sound.setVolume_(sound_volume)
-        _button_sound.play()
-
 def create_submenu(button_list, callback, type=""):
     """Creates a submenu containing rumps.MenuItem objects from a list of strings
 
@@ -67,6 +55,7 @@ def create_submenu(button_list, callback, type=""):
     Returns:
         list: list containing rumps.MenuItem objects
     """
+    import rumps
     submenu = []
     for n in button_list:
         if type != "":
@@ -103,28 +92,351 @@ def open_file(file_path):
             data = {}
     return data
 
-def read_stats(path):
-    """Returns the flat list of interval records from the stats file."""
+def iter_stats(path):
+    """Yields the interval records of the stats file one at a time.
+
+    Reads the append-only log (one JSON record per line) lazily, as well as the
+    JSON array written by earlier versions (which has to be parsed whole).
+    Lines that fail to parse, such as a record torn by a crash mid-write, are skipped.
+    """
+    try:
+        with open(path) as f:
+            head = f.read(64).lstrip()
+            f.seek(0)
+            if head.startswith("["):
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    return
+                if isinstance(data, list):
+                    yield from data
+                return
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+    except FileNotFoundError:
+        return
+
+
+def iter_weekly_stats(path):
+    """Yields the intervals of a stats file in the weekly format of the first versions as records, in start order.
+
+    That format nests intervals by week and session, with the start in the key:
+    {"2022_20": {"05.20._18:52:42-05.21._04:29:20": {"pomodoro_05.20._18:52:42": 1500, ...}}}
+    The year comes from the week key, intervals of that format have no project.
+    """
     try:
         with open(path) as f:
             data = json.load(f)
-            if isinstance(data, list):
-                return data
     except (FileNotFoundError, json.JSONDecodeError):
-        pass
-    return []
+        return
+    if not isinstance(data, dict):
+        return
+    records = []
+    for week, sessions in data.items():
+        try:
+            year, week_number = (int(part) for part in week.split("_"))
+        except ValueError:
+            continue
+        if not isinstance(sessions, dict):
+            continue
+        for intervals in sessions.values():
+            if not isinstance(intervals, dict):
+                continue
+            for key, duration in intervals.items():
+                interval_type, _, stamp = key.partition("_")
+                # the first or last week of a year can hold days of the neighbouring one
+                start_year = year
+                if week_number >= 52 and stamp.startswith("01."):
+                    start_year += 1
+                elif week_number <= 1 and stamp.startswith("12."):
+                    start_year -= 1
+                try:
+                    start = datetime.strptime("{}.{}".format(start_year, stamp), "%Y.%m.%d._%H:%M:%S")
+                except ValueError:
+                    continue
+                records.append({
+                    "type": interval_type,
+                    "start": start.isoformat(timespec="seconds"),
+                    "duration": duration,
+                    "project": "",
+                })
+    records.sort(key=lambda record: record["start"])
+    yield from records
+
+
+def stats_format(path):
+    """Returns the format of a stats file: "log" (the append-only log), "list" (the JSON array
+    of earlier versions) or "weekly" (the format of the first versions, see iter_weekly_stats)
+
+    Raises:
+        FileNotFoundError: if there is no such file
+    """
+    with open(path) as f:
+        first_line = f.readline().lstrip()
+    if first_line.startswith("["):
+        return "list"
+    # every line of the log is a whole record, a pretty printed weekly file starts with a lone "{"
+    if first_line.startswith("{"):
+        try:
+            first = json.loads(first_line)
+        except json.JSONDecodeError:
+            first = None
+        if not isinstance(first, dict) or "start" not in first:
+            return "weekly"
+    return "log"
+
+
+def iter_any_stats(path):
+    """Yields the records of a stats file in any format Tomado has written (see stats_format)"""
+    try:
+        weekly = stats_format(path) == "weekly"
+    except FileNotFoundError:
+        return
+    yield from iter_weekly_stats(path) if weekly else iter_stats(path)
+
+
+def read_stats(path):
+    """Returns the flat list of interval records from the stats file (see iter_stats)."""
+    return list(iter_stats(path))
+
+
+def append_record(path, record):
+    """Appends an interval record to the stats log as a single JSON line.
+
+    Args:
+        path (string): path of the stats log
+        record (dict): the interval record
+
+    Returns:
+        int: size of the log after the write, in bytes
+    """
+    with open(path, "a+b") as f:
+        line = json.dumps(record).encode() + b"\n"
+        # a torn last line (crash mid-write) must not swallow the new record
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+        return f.tell()
 
 
 def append_interval(path, interval_type, start, duration, project=""):
-    """Appends a completed interval record to the stats file."""
-    stats = read_stats(path)
-    stats.append({
-        "type": interval_type,
-        "start": start,
-        "duration": duration,
-        "project": project,
-    })
-    save_file(path, stats)
+    """Appends a completed interval record to the stats log as a single JSON line.
+
+    Returns:
+        dict: the record that was written
+    """
+    if not isinstance(start, int):
+        start = int(datetime.fromisoformat(start).timestamp())
+    record = make_record(interval_type, start, duration, project)
+    append_record(path, record)
+    return record
+
+
+def read_stats_from(path, offset=0):
+    """Reads the records appended to the stats log after a byte offset.
+
+    Args:
+        path (string): path of the stats log
+        offset (int, optional): byte offset to start reading at. Defaults to 0.
+
+    Returns:
+        tuple: (list of records, byte offset of the end of the log)
+    """
+    records = []
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+            offset = f.tell()
+    except FileNotFoundError:
+        pass
+    return records, offset
+
+
+# bytes read per step by read_recent
+RECENT_BLOCK = 8192
+
+
+def read_recent(path, count, before=None):
+    """Reads the last records of the stats log, newest first, reading backwards from the end in fixed-size blocks,
+    so the cost depends on count and not on the length of the history.
+
+    Args:
+        path (string): path of the stats log
+        count (int): number of records to read
+        before (int, optional): byte offset to read back from, the offset returned by a previous call
+            pages further back. Defaults to the end of the log.
+
+    Returns:
+        tuple: (list of records, newest first; byte offset of the oldest one returned, 0 once the log start is reached)
+    """
+    records = []
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return records, 0
+    with f:
+        pos = f.seek(0, os.SEEK_END) if before is None else before
+        # the start of the earliest line read so far, which may still be incomplete
+        head = b""
+        while pos > 0 and len(records) < count:
+            size = min(RECENT_BLOCK, pos)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + head
+            lines = data.split(b"\n")
+            # the first line is only complete at the start of the log
+            head = lines.pop(0) if pos > 0 else b""
+            end = pos + len(data)
+            for line in reversed(lines):
+                start = end - len(line)
+                end = start - 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+                    if len(records) == count:
+                        return records, start
+        return records, 0
+
+
+def skip_records(path, offset, count):
+    """Returns the byte offset after the first count records of the stats log that start at offset
+
+    Pages read by read_recent end at the record starting at their offset, so this moves
+    that end forward again, e.g. after the oldest records read were dropped.
+    Lines that aren't records are skipped without being counted, as read_recent does.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while count > 0:
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if isinstance(record, dict):
+                count -= 1
+        return f.tell()
+
+
+def migrate_stats(legacy_path, log_path):
+    """One-time conversion of the JSON array stats file into the append-only log.
+
+    Does nothing if the log already exists. The legacy file is left untouched.
+
+    Args:
+        legacy_path (string): path of the old stats.json
+        log_path (string): path of the new stats log
+
+    Returns:
+        bool: True if a new log was written
+    """
+    if os.path.exists(log_path):
+        return False
+    temp_path = log_path + ".tmp"
+    with open(temp_path, "w") as f:
+        for record in read_stats(legacy_path):
+            f.write(json.dumps(record) + "\n")
+    os.replace(temp_path, log_path)
+    return True
+
+
+EXPORT_FORMATS = ("csv", "jsonl", "daily")
+# rows buffered before each write
+EXPORT_CHUNK = 1000
+
+
+def export_records(records, f, fmt="csv", start=None, end=None, project=None):
+    """Streams interval records into an open text file, keeping memory constant.
+
+    Args:
+        records (iterable): interval records, e.g. iter_stats(path)
+        f (file): text file opened with newline=""
+        fmt (string, optional): 'csv' (one row per interval), 'jsonl' (one record per line)
+            or 'daily' (one row of totals per day). Defaults to "csv".
+        start (datetime, optional): only records starting at or after start
+        end (datetime, optional): only records starting before end
+        project (string, optional): only records of this project ("" for no project)
+
+    Returns:
+        int: number of records exported
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError("unknown export format: {}".format(fmt))
+    writer = csv.writer(f)
+    if fmt == "csv":
+        writer.writerow(["date", "time", "type", "duration_seconds", "duration_minutes", "project"])
+    elif fmt == "daily":
+        writer.writerow(["date", "pomodoros", "pomodoro_seconds", "breaks", "break_seconds"])
+    # date -> [pomodoros, pomodoro_seconds, breaks, break_seconds], one entry per day
+    days = {}
+    chunk = []
+    count = 0
+    # records start on whole seconds
+    start = None if start is None else math.ceil(start.timestamp())
+    end = None if end is None else math.ceil(end.timestamp())
+    local_days = LocalDays()
+    for record in records:
+        ts = record_start(record)
+        if ts is None:
+            continue
+        if (start is not None and ts < start) or (end is not None and ts >= end):
+            continue
+        if project is not None and record.get("project", "") != project:
+            continue
+        count += 1
+        duration = record.get("duration", 0)
+        if fmt == "csv":
+            seconds = local_days.wall_seconds(ts)
+            chunk.append([
+                local_days.day(ts).isoformat(),
+                "{:02d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60),
+                record.get("type", ""),
+                duration,
+                round(duration / 60, 2),
+                record.get("project", ""),
+            ])
+        elif fmt == "jsonl":
+            chunk.append(json.dumps(record) + "\n")
+        else:
+            day = days.setdefault(local_days.day(ts), [0, 0, 0, 0])
+            i = 0 if record.get("type") == "pomodoro" else 2
+            day[i] += 1
+            day[i + 1] += duration
+        if len(chunk) >= EXPORT_CHUNK:
+            _write_chunk(f, writer, fmt, chunk)
+            chunk = []
+    _write_chunk(f, writer, fmt, chunk)
+    if fmt == "daily":
+        writer.writerows([day.isoformat()] + totals for day, totals in sorted(days.items()))
+    return count
+
+
+def _write_chunk(f, writer, fmt, chunk):
+    if fmt == "jsonl":
+        f.write("".join(chunk))
+    else:
+        writer.writerows(chunk)
 
 
 def _add_to_project(by_project, project, interval_type, duration):
@@ -151,16 +463,18 @@ def compute_stats(stats, today):
         dict with keys 'today', 'week', 'all_time', each containing:
             pomodoros, pomodoro_time, breaks, break_time, by_project
     """
-    week_start = today - timedelta(days=today.weekday())
+    # the periods as epoch second bounds, records are compared as ints without deriving their date
+    today_start = local_midnight(today)
+    today_end = local_midnight(today + timedelta(days=1))
+    week_start = local_midnight(today - timedelta(days=today.weekday()))
 
     result_today    = dict(pomodoros=0, pomodoro_time=0, breaks=0, break_time=0, by_project={})
     result_week     = dict(pomodoros=0, pomodoro_time=0, breaks=0, break_time=0, by_project={})
     result_all_time = dict(pomodoros=0, pomodoro_time=0, breaks=0, break_time=0, by_project={})
 
     for record in stats:
-        try:
-            start_date = datetime.fromisoformat(record["start"]).date()
-        except (KeyError, ValueError):
+        ts = record_start(record)
+        if ts is None:
             continue
 
         duration = record.get("duration", 0)
@@ -176,7 +490,7 @@ def compute_stats(stats, today):
             result_all_time["break_time"] += duration
         _add_to_project(result_all_time["by_project"], project, itype, duration)
 
-        if start_date < week_start:
+        if ts < week_start:
             continue
 
         if is_pomodoro:
@@ -187,7 +501,7 @@ def compute_stats(stats, today):
             result_week["break_time"] += duration
         _add_to_project(result_week["by_project"], project, itype, duration)
 
-        if start_date != today:
+        if not today_start <= ts < today_end:
             continue
 
         if is_pomodoro:
@@ -201,6 +515,277 @@ def compute_stats(stats, today):
     return {"today": result_today, "week": result_week, "all_time": result_all_time}
 
 
+def _empty_period():
+    return dict(pomodoros=0, pomodoro_time=0, breaks=0, break_time=0, by_project={})
+
+
+def _add_to_period(period, project, interval_type, duration):
+    if interval_type == "pomodoro":
+        period["pomodoros"] += 1
+        period["pomodoro_time"] += duration
+    else:
+        period["breaks"] += 1
+        period["break_time"] += duration
+    _add_to_project(period["by_project"], project, interval_type, duration)
+
+
+def _remove_from_period(period, project, interval_type, duration):
+    """Takes an interval added by _add_to_period back out, dropping the project once it has no intervals left"""
+    counts, time_key = ("pomodoros", "pomodoro_time") if interval_type == "pomodoro" else ("breaks", "break_time")
+    period[counts] -= 1
+    period[time_key] -= duration
+    data = period["by_project"].get(project) if project else None
+    if data is not None:
+        data[counts] -= 1
+        data[time_key] -= duration
+        if not data["pomodoros"] and not data["breaks"]:
+            del period["by_project"][project]
+
+
+def _merge_period(period, other):
+    for key in ("pomodoros", "pomodoro_time", "breaks", "break_time"):
+        period[key] += other[key]
+    for project, data in other["by_project"].items():
+        if project not in period["by_project"]:
+            period["by_project"][project] = dict(pomodoros=0, pomodoro_time=0, breaks=0, break_time=0)
+        for key, value in data.items():
+            period["by_project"][project][key] += value
+
+
+def _copy_period(period):
+    copy = dict(period)
+    copy["by_project"] = {project: dict(data) for project, data in period["by_project"].items()}
+    return copy
+
+
+def _project_period(period, project):
+    """Returns the part of a period that belongs to one project ("" for intervals without a project)"""
+    if project:
+        data = period["by_project"].get(project)
+        if data is None:
+            return _empty_period()
+        result = dict(data)
+        result["by_project"] = {project: dict(data)}
+        return result
+    result = dict(period)
+    for data in period["by_project"].values():
+        for key, value in data.items():
+            result[key] -= value
+    result["by_project"] = {}
+    return result
+
+
+def stats_windows(today):
+    """Returns the extra periods of the Stats menu as (title, first day, last day) tuples
+
+    Args:
+        today (datetime.date): the reference date
+    """
+    return [
+        ("Last 7 Days", today - timedelta(days=6), today),
+        ("Last 30 Days", today - timedelta(days=29), today),
+        ("This Month", today.replace(day=1), today),
+        ("This Year", today.replace(month=1, day=1), today),
+    ]
+
+
+class StatsAggregator(object):
+    """Keeps the totals returned by compute_stats up to date as intervals are added,
+    so the menu can be refreshed without re-reading the whole stats file.
+
+    Totals are kept per day, which lets today and the week roll over at midnight
+    and on Mondays without going back to the raw records.
+    """
+    def __init__(self, today):
+        self.today = today
+        self.week_start = today - timedelta(days=today.weekday())
+        self.all_time = _empty_period()
+        self.week = _empty_period()
+        # datetime.date -> period totals of that day
+        self.days = {}
+        # the keys of days in order, searched by between()
+        self.day_index = []
+        # bytes of the stats log already added, see load_aggregator
+        self.offset = 0
+        self._local_days = LocalDays()
+
+    def load(self, stats):
+        """Adds every record of a flat list of interval records"""
+        for record in stats:
+            self.add(record)
+
+    def load_days(self, days):
+        """Adds per-day totals (datetime.date -> period dict), such as the ones saved in the rollup index"""
+        for day, period in days.items():
+            if day not in self.days:
+                self._new_day(day)
+            _merge_period(self.days[day], period)
+            _merge_period(self.all_time, period)
+            if day >= self.week_start:
+                _merge_period(self.week, period)
+
+    def add(self, record):
+        """Adds a single interval record in O(1)
+
+        Returns:
+            bool: False if the record has no valid start and was ignored
+        """
+        ts = record_start(record)
+        if ts is None:
+            return False
+        start_date = self._local_days.day(ts)
+        duration = record.get("duration", 0)
+        project = record.get("project", "")
+        itype = "pomodoro" if record.get("type") == "pomodoro" else "break"
+
+        _add_to_period(self.all_time, project, itype, duration)
+        if start_date not in self.days:
+            self._new_day(start_date)
+        _add_to_period(self.days[start_date], project, itype, duration)
+        if start_date >= self.week_start:
+            _add_to_period(self.week, project, itype, duration)
+        return True
+
+    def remove(self, record):
+        """Takes a record added by add() back out, e.g. when writing it to the log failed
+
+        Returns:
+            bool: False if the record has no valid start or its day has no intervals
+        """
+        ts = record_start(record)
+        if ts is None:
+            return False
+        start_date = self._local_days.day(ts)
+        if start_date not in self.days:
+            return False
+        duration = record.get("duration", 0)
+        project = record.get("project", "")
+        itype = "pomodoro" if record.get("type") == "pomodoro" else "break"
+
+        _remove_from_period(self.all_time, project, itype, duration)
+        _remove_from_period(self.days[start_date], project, itype, duration)
+        if not self.days[start_date]["pomodoros"] and not self.days[start_date]["breaks"]:
+            del self.days[start_date]
+            self.day_index.remove(start_date)
+        if start_date >= self.week_start:
+            _remove_from_period(self.week, project, itype, duration)
+        return True
+
+    def _new_day(self, day):
+        self.days[day] = _empty_period()
+        # records come in start order, so this is almost always an append
+        if not self.day_index or day > self.day_index[-1]:
+            self.day_index.append(day)
+        else:
+            bisect.insort(self.day_index, day)
+
+    def roll_over(self, today):
+        """Moves the reference date, rebuilding the week totals when the week changes"""
+        if today == self.today:
+            return
+        self.today = today
+        week_start = today - timedelta(days=today.weekday())
+        if week_start != self.week_start:
+            self.week_start = week_start
+            self.week = _empty_period()
+            for day, period in self.days.items():
+                if day >= week_start:
+                    _merge_period(self.week, period)
+
+    def results(self, today):
+        """Returns the same dict as compute_stats(all added records, today)"""
+        self.roll_over(today)
+        return {
+            "today": _copy_period(self.days.get(today, _empty_period())),
+            "week": _copy_period(self.week),
+            "all_time": _copy_period(self.all_time),
+        }
+
+    def between(self, start, end, project=None):
+        """Returns the totals of the days from start to end (datetime.date, both inclusive)
+
+        The days are found by binary search, so it costs O(log days + days in the range),
+        regardless of the number of intervals.
+
+        Args:
+            project (string, optional): only count this project ("" for no project). Defaults to all.
+        """
+        lo = bisect.bisect_left(self.day_index, start)
+        hi = bisect.bisect_right(self.day_index, end, lo)
+        result = _empty_period()
+        for day in self.day_index[lo:hi]:
+            _merge_period(result, self.days[day])
+        if project is not None:
+            result = _project_period(result, project)
+        return result
+
+
+ROLLUP_VERSION = 1
+
+
+def save_rollup(path, aggregator):
+    """Saves the per-day totals of an aggregator as the rollup index of the stats log
+
+    Args:
+        path (string): path of the rollup index
+        aggregator (StatsAggregator): the totals to be saved
+    """
+    rollup = {
+        "version": ROLLUP_VERSION,
+        "offset": aggregator.offset,
+        "days": {day.isoformat(): period for day, period in aggregator.days.items()},
+    }
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(rollup, f)
+    os.replace(temp_path, path)
+
+
+def load_aggregator(log_path, rollup_path, today, save=True):
+    """Returns a StatsAggregator for the stats log, loaded from the per-day rollup index next to it.
+
+    Records appended after the index was saved are read from the tail of the log.
+    The index is rebuilt from the whole log when it is missing, unreadable, or
+    covers more than the log holds (the log was cleared or replaced).
+
+    Args:
+        log_path (string): path of the stats log
+        rollup_path (string): path of the rollup index
+        today (datetime.date): the reference date
+        save (bool, optional): save the index after reading records from the log. Defaults to True.
+
+    Returns:
+        StatsAggregator: the loaded totals
+    """
+    try:
+        size = os.path.getsize(log_path)
+    except FileNotFoundError:
+        size = 0
+    try:
+        rollup = open_file(rollup_path)
+    except FileNotFoundError:
+        rollup = {}
+
+    aggregator = StatsAggregator(today)
+    loaded = False
+    if isinstance(rollup, dict) and rollup.get("version") == ROLLUP_VERSION:
+        offset = rollup.get("offset")
+        if isinstance(offset, int) and 0 <= offset <= size:
+            try:
+                aggregator.load_days({date.fromisoformat(day): period for day, period in rollup["days"].items()})
+                aggregator.offset = offset
+                loaded = True
+            except (KeyError, ValueError, TypeError, AttributeError):
+                aggregator = StatsAggregator(today)
+
+    if not loaded or aggregator.offset < size:
+        records, aggregator.offset = read_stats_from(log_path, aggregator.offset)
+        aggregator.load(records)
+        if save:
+            save_rollup(rollup_path, aggregator)
+    return aggregator
+
+
 def prefs_update(prefs_og, prefs_new):
     """updates the prefs saved by user to be compatible with a new version, keeping the user selected values
 